@@ -0,0 +1,298 @@
+"""
+Benchmarks dos métodos numéricos.
+Para executar:
+    python benchmark.py importacao
+    python benchmark.py metodos [--passos 10 100 1000] [--metodos euler dp_fixo] [--problemas pvi1 influx]
+                                [--repeticoes 3] [--memoria-max-passos 100000] [--saida benchmark.json]
+    python benchmark.py compara antigo.json novo.json [--tolerancia 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import func
+import influx
+
+#   tempo máximo, em segundos, para importar o func sem sympy, scipy e matplotlib
+LIMITE_IMPORTACAO = 0.6
+MODULOS_PESADOS = ('sympy', 'scipy', 'matplotlib')
+
+PASSOS_BENCHMARK = (10, 100, 1000, 10000, 100000, 1000000)
+METODOS_BENCHMARK = ('euler', 'euler_mel', 'euler_mod', 'gen_um_terco', 'gen_um_quarto', 'dp_fixo', 'dp_adap')
+PROBLEMAS_BENCHMARK = ('pvi1', 'pvi2', 'pvi3', 'influx')
+#   o tracemalloc deixa os métodos várias vezes mais lentos; acima disso o pico de memória não é medido por padrão
+MEMORIA_MAX_PASSOS = 100000
+#   tempos abaixo disso são dominados por ruído e não são comparados
+TEMPO_MINIMO_COMPARACAO = 1e-3
+
+_PASTA = os.path.dirname(os.path.abspath(__file__))
+
+_CODIGO_IMPORTACAO = f"""
+import sys, time
+inicio = time.perf_counter()
+import func
+duracao = time.perf_counter() - inicio
+print(duracao, *[modulo for modulo in {MODULOS_PESADOS!r} if modulo in sys.modules])
+"""
+
+
+def benchmark_importacao(repeticoes=5, limite=LIMITE_IMPORTACAO):
+    """
+    Mede o tempo de importar o func, cada vez num interpretador novo (sem nada em cache no sys.modules), e confere
+    que o sympy, o scipy e o matplotlib não foram carregados junto
+    :param repeticoes: número de interpretadores a serem medidos
+    :param limite: tempo máximo aceito, em segundos, para a menor das medições
+    :return: dicionário com os tempos medidos, o menor deles, os módulos pesados carregados e se passou no limite
+    """
+    tempos = []
+    carregados = set()
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, '-c', _CODIGO_IMPORTACAO], cwd=_PASTA, capture_output=True, text=True,
+                               check=True).stdout.split()
+        tempos.append(float(saida[0]))
+        carregados.update(saida[1:])
+
+    #   o menor tempo é o menos afetado por ruído do sistema
+    return {'tempos': tempos, 'minimo': min(tempos), 'carregados': sorted(carregados),
+            'ok': min(tempos) <= limite and not carregados}
+
+
+def prepara_pvi(nome):
+    """
+    Compila um dos três PVIs do main.py e a sua solução exata, ambos reaproveitados em todos os números de passos
+    :param nome: 'pvi1', 'pvi2' ou 'pvi3'
+    :return: função que recebe o número de passos e retorna (y_zero, x_zero, h, edo, exata), com os passos
+    cobrindo o mesmo intervalo [x_zero, x_zero + 1] do main.py
+    """
+    x, y, f = func.x, func.y, func.f
+    y_linha, y_zero, x_zero = {'pvi1': (-f(x), 1, 0),
+                               'pvi2': ((x + f(x) + 1) / (2 * x), 4, 2),
+                               'pvi3': (f(x) * (pow(x, 2) - 1), 1, 0)}[nome]
+
+    avaliador = func.sol_real_em_cache(y_linha, y_zero, x_zero)[1]
+    edo = func.EdoCompilada(y_linha.subs(f(x), y))
+
+    def problema(passos):
+        h = 1 / passos
+        return y_zero, x_zero, h, edo, avaliador(x_zero + h * np.arange(passos + 1))
+
+    return problema
+
+
+def prepara_influx(semente=0):
+    """
+    Modelo do reservatório de influx.v_linha, com a forçante de cada unidade de tempo gerada por influx.forcante(), e
+    a EDO dada como func.EdoForcante, para chegar a 10^6 passos sem gerar uma EDO simbólica por passo. A solução exata
+    é a integral dessa forçante constante por partes
+    :param semente: semente do ruído
+    :return: função que recebe o número de passos (unidades de tempo, h = 1) e retorna (y_zero, x_zero, h, edo, exata)
+    """
+    def problema(passos):
+        forcante = influx.forcante(passos, gerador=np.random.default_rng(semente))[0]
+        exata = np.concatenate(([0.0], np.cumsum(forcante[:-1]))) + 500
+        return 500, 0, 1, func.EdoForcante(forcante), exata
+
+    return problema
+
+
+def executa_metodo(metodo, y_zero, x_zero, h, num_repet, edo):
+    """
+    Calcula o PVI com um dos métodos de func.calcula_metodos()
+    :param metodo: nome do método, ver METODOS_BENCHMARK
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param edo: EdoCompilada (uma func.EdoContada para contar as avaliações)
+    :return: valores de y na grade
+    """
+    if metodo == 'dp_adap':
+        #   como em func.calcula_metodos(), o adaptativo entra na grade pela solução densa
+        adaptativo = func.dormand_price_adap(y_zero, x_zero, h, num_repet, edo, densa=True)
+        return adaptativo[3](x_zero + h * np.arange(num_repet + 1))
+
+    funcao, argumentos, _ = func.metodos_passo_fixo('lambdify')[metodo]
+    return funcao(y_zero, x_zero, h, num_repet, edo, *argumentos)
+
+
+def mede_metodo(metodo, pvi, repeticoes=1, memoria=True):
+    """
+    Mede um método em um PVI: o tempo é o menor de repeticoes execuções, e o pico de memória e as avaliações da EDO
+    vêm de uma execução a mais, com o tracemalloc ligado e a EDO contada, para que nenhum dos dois entre no tempo
+    :param metodo: nome do método, ver METODOS_BENCHMARK
+    :param pvi: (y_zero, x_zero, h, edo, exata), como retornado pelos problemas de prepara_pvi() e prepara_influx()
+    :param repeticoes: número de execuções cronometradas
+    :param memoria: se False, não faz a execução com o tracemalloc e memoria_pico é None
+    :return: dicionário com tempo (s), avaliacoes_por_passo, memoria_pico (bytes), erro_maximo e erro_rms
+    """
+    y_zero, x_zero, h, edo, exata = pvi
+    num_repet = len(exata) - 1
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        executa_metodo(metodo, y_zero, x_zero, h, num_repet, edo)
+        tempos.append(time.perf_counter() - inicio)
+
+    #   as avaliações são contadas por uma EdoContada fora das execuções cronometradas, na execução que mede a memória
+    contada = func.EdoContada(edo)
+    memoria_pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            valores = executa_metodo(metodo, y_zero, x_zero, h, num_repet, contada)
+            memoria_pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    else:
+        valores = executa_metodo(metodo, y_zero, x_zero, h, num_repet, contada)
+    avaliacoes = contada.avaliacoes
+
+    analise = func.analisa_erros(np.asarray(valores)[None], exata)
+    return {'tempo': min(tempos), 'avaliacoes_por_passo': avaliacoes / num_repet, 'memoria_pico': memoria_pico,
+            'erro_maximo': float(analise.maximo[0]), 'erro_rms': float(analise.rms[0])}
+
+
+def benchmark_metodos(passos=PASSOS_BENCHMARK, metodos=METODOS_BENCHMARK, problemas=PROBLEMAS_BENCHMARK,
+                      repeticoes=1, memoria_max_passos=MEMORIA_MAX_PASSOS, imprime=True):
+    """
+    Mede cada método em cada problema (os três PVIs do main.py e o reservatório do influx) para cada número de passos
+    :param passos: números de passos
+    :param metodos: nomes dos métodos, ver METODOS_BENCHMARK
+    :param problemas: nomes dos problemas, ver PROBLEMAS_BENCHMARK
+    :param repeticoes: número de execuções cronometradas de cada medição, ver mede_metodo()
+    :param memoria_max_passos: maior número de passos com o pico de memória medido (None para todos)
+    :param imprime: se True, imprime cada medição conforme fica pronta
+    :return: dicionário com o ambiente (versões e máquina) e a lista de medições, pronto para ser gravado em JSON
+    """
+    medicoes = []
+    for nome_problema in problemas:
+        problema = prepara_influx() if nome_problema == 'influx' else prepara_pvi(nome_problema)
+        for num_passos in passos:
+            pvi = problema(num_passos)
+            memoria = memoria_max_passos is None or num_passos <= memoria_max_passos
+            for metodo in metodos:
+                medicao = {'problema': nome_problema, 'metodo': metodo, 'passos': num_passos,
+                           **mede_metodo(metodo, pvi, repeticoes, memoria)}
+                medicoes.append(medicao)
+                if imprime:
+                    print(_formata_medicao(medicao), flush=True)
+
+    ambiente = {'data': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                'numpy': np.__version__, 'plataforma': platform.platform(), 'processador': platform.processor(),
+                'repeticoes': repeticoes, 'memoria_max_passos': memoria_max_passos}
+    return {'ambiente': ambiente, 'medicoes': medicoes}
+
+
+def _formata_medicao(medicao):
+    memoria = '        -' if medicao['memoria_pico'] is None else f"{medicao['memoria_pico'] / 2 ** 20:>9.2f}"
+    return (f"{medicao['problema']:<7}{medicao['metodo']:<14}{medicao['passos']:>9} passos "
+            f"{medicao['tempo']:>11.6f} s {medicao['avaliacoes_por_passo']:>8.3g} aval/passo "
+            f"{memoria} MiB erro máx {medicao['erro_maximo']:.3e}")
+
+
+def compara_benchmarks(antigo, novo, tolerancia=0.2):
+    """
+    Compara duas execuções de benchmark_metodos(), medição a medição (mesmo problema, método e número de passos)
+    :param antigo: dicionário de referência, como retornado por benchmark_metodos() ou lido do JSON
+    :param novo: dicionário a ser comparado
+    :param tolerancia: aumento relativo aceito no tempo, na memória e no erro máximo antes de contar como regressão
+    :return: lista de dicts com problema, metodo, passos, as razões novo / antigo de tempo, memoria e erro, e a lista
+    regressoes com as grandezas que pioraram além da tolerância
+    """
+    def chave(medicao):
+        return medicao['problema'], medicao['metodo'], medicao['passos']
+
+    referencia = {chave(medicao): medicao for medicao in antigo['medicoes']}
+
+    comparacoes = []
+    for medicao in novo['medicoes']:
+        anterior = referencia.get(chave(medicao))
+        if anterior is None:
+            continue
+
+        razoes = {'tempo': _razao(medicao['tempo'], anterior['tempo']),
+                  'memoria': _razao(medicao['memoria_pico'], anterior['memoria_pico']),
+                  'erro': _razao(medicao['erro_maximo'], anterior['erro_maximo'], 1e-15)}
+        regressoes = [grandeza for grandeza, razao in razoes.items() if razao > 1 + tolerancia]
+        if 'tempo' in regressoes and max(medicao['tempo'], anterior['tempo']) < TEMPO_MINIMO_COMPARACAO:
+            regressoes.remove('tempo')
+
+        comparacoes.append({'problema': medicao['problema'], 'metodo': medicao['metodo'],
+                            'passos': medicao['passos'], **razoes, 'regressoes': regressoes})
+
+    return comparacoes
+
+
+def _razao(novo, antigo, piso=0):
+    #   valores abaixo do piso (ex.: erros de arredondamento) contam como iguais ao piso; grandezas não medidas
+    #   (memória acima de MEMORIA_MAX_PASSOS) não são comparadas
+    if novo is None or antigo is None:
+        return 1.0
+    novo, antigo = max(novo, piso), max(antigo, piso)
+    if antigo == 0:
+        return 1.0 if novo == 0 else float('inf')
+    return novo / antigo
+
+
+def main(argumentos):
+    analisador = argparse.ArgumentParser(description='Benchmarks dos métodos numéricos')
+    comandos = analisador.add_subparsers(dest='comando', required=True)
+
+    comandos.add_parser('importacao', help='tempo de importação do func')
+
+    metodos = comandos.add_parser('metodos', help='tempo, avaliações da EDO, memória e erro de cada método')
+    metodos.add_argument('--passos', type=int, nargs='+', default=list(PASSOS_BENCHMARK))
+    metodos.add_argument('--metodos', nargs='+', choices=METODOS_BENCHMARK, default=list(METODOS_BENCHMARK))
+    metodos.add_argument('--problemas', nargs='+', choices=PROBLEMAS_BENCHMARK, default=list(PROBLEMAS_BENCHMARK))
+    metodos.add_argument('--repeticoes', type=int, default=1)
+    metodos.add_argument('--memoria-max-passos', type=int, default=MEMORIA_MAX_PASSOS)
+    metodos.add_argument('--saida', default='benchmark.json')
+
+    compara = comandos.add_parser('compara', help='compara dois arquivos gerados pelo comando metodos')
+    compara.add_argument('antigo')
+    compara.add_argument('novo')
+    compara.add_argument('--tolerancia', type=float, default=0.2)
+
+    opcoes = analisador.parse_args(argumentos)
+
+    if opcoes.comando == 'importacao':
+        resultado = benchmark_importacao()
+        print(f"import func: {resultado['minimo'] * 1000:.1f} ms (limite {LIMITE_IMPORTACAO * 1000:.0f} ms), "
+              f"tempos: {', '.join(f'{tempo * 1000:.1f}' for tempo in resultado['tempos'])} ms")
+        if resultado['carregados']:
+            print(f"módulos carregados sem necessidade: {', '.join(resultado['carregados'])}")
+        return 0 if resultado['ok'] else 1
+
+    if opcoes.comando == 'metodos':
+        resultado = benchmark_metodos(opcoes.passos, opcoes.metodos, opcoes.problemas, opcoes.repeticoes,
+                                      opcoes.memoria_max_passos)
+        with open(opcoes.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=1)
+        print(f'medições gravadas em {opcoes.saida}')
+        return 0
+
+    with open(opcoes.antigo, encoding='utf-8') as arquivo:
+        antigo = json.load(arquivo)
+    with open(opcoes.novo, encoding='utf-8') as arquivo:
+        novo = json.load(arquivo)
+
+    comparacoes = compara_benchmarks(antigo, novo, opcoes.tolerancia)
+    for comparacao in comparacoes:
+        marca = f"  REGRESSÃO: {', '.join(comparacao['regressoes'])}" if comparacao['regressoes'] else ''
+        print(f"{comparacao['problema']:<7}{comparacao['metodo']:<14}{comparacao['passos']:>9} passos "
+              f"tempo x{comparacao['tempo']:.2f} memória x{comparacao['memoria']:.2f} "
+              f"erro x{comparacao['erro']:.2f}{marca}")
+    return 1 if any(comparacao['regressoes'] for comparacao in comparacoes) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,41 +1,677 @@
-from sympy import *
-from matplotlib import pyplot as plt
-from scipy.integrate import solve_ivp
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from functools import wraps
+from math import inf
+from operator import mul
 
+import numpy as np
 
-x, y = symbols('x y')
-f = Function('f')
-init_printing(use_unicode=True)
+#   sympy, scipy e matplotlib são importados dentro das funções que os usam, assim o núcleo numérico (métodos com
+#   EDOs dadas como funções python, Resultados, análise e exportação) é importado só com o numpy
 
+DIRETORIO_CACHE_SOL_REAL = '.cache_sol_real'
+TAMANHO_CACHE_SOL_REAL = 128
+_CACHE_SOL_REAL = OrderedDict()
 
-def euler(y_zero, x_zero, h, num_repet, y_linha):
+#   linhas impressas por print_dados(); os resultados completos vão para exporta_resultados()
+LINHAS_TABELA = 25
+
+#   pontos por série nos gráficos, ver reduz_pontos(); gráficos em segundo plano, ver agenda_grafico()
+MAX_PONTOS_GRAFICO = 4000
+#   (pid do processo que o criou, executor)
+_EXECUTOR_GRAFICOS = None
+_GRAFICOS_PENDENTES = []
+
+
+def __getattr__(nome):
+    #   x, y e f do sympy (func.x, func.y, func.f) só são criados, e o sympy importado, no primeiro uso
+    if nome in ('x', 'y', 'f'):
+        from sympy import Function, symbols
+
+        simbolos = dict(zip(('x', 'y'), symbols('x y')), f=Function('f'))
+        globals().update(simbolos)
+        return simbolos[nome]
+    raise AttributeError(f'module {__name__!r} has no attribute {nome!r}')
+
+
+def _e_simbolico(objeto):
+    #   objetos do sympy são reconhecidos pelo módulo da classe, sem importar o sympy
+    return type(objeto).__module__.partition('.')[0] == 'sympy'
+
+
+class EdoCompilada:
     """
-    Calula a EDO utilizando o método de Euler
-    euler => y(n+1) = yn + hf(xn, yn)
+    EDO y' = f(x, y) compilada uma única vez, para que os métodos numéricos a avaliem com floats python em vez de
+    percorrer a árvore simbólica com .subs a cada estágio. Sistemas de EDOs são dados por uma Matrix do sympy com uma
+    EDO por componente do estado, e então y e f(x, y) são arrays numpy. A EDO também pode ser uma função python
+    f(x, y) (mais os valores dos parâmetros, se houver), que é usada diretamente e dispensa o sympy
+    :param y_linha: EDO simbolica (ou Matrix de EDOs) ou função python, ou lista delas com uma por passo (uma
+    forçante numérica por passo, que não depende de y, é mais leve como EdoForcante)
+    :param modo: 'lambdify' para avaliar funções numéricas compiladas, 'subs' para o caminho simbólico de referência
+    :param parametros: símbolos extras da EDO, com valores por trajetória fornecidos em runge_kutta_lote(). Uma EDO
+    com parâmetros só é avaliada pela forma vetorizada
+    :param estados: símbolos das componentes do estado de um sistema (padrão y1, y2, ..., yd)
+    :param dimensao: número de componentes do estado quando a EDO é uma função python de um sistema (None para uma
+    EDO escalar); EDOs simbólicas têm a dimensão da Matrix
+    """
+
+    def __init__(self, y_linha, modo='lambdify', parametros=(), estados=None, dimensao=None):
+        if modo not in ('lambdify', 'subs'):
+            raise ValueError(f"modo deve ser 'lambdify' ou 'subs', recebido: {modo!r}")
+
+        self.y_linha = y_linha
+        self.modo = modo
+        self.parametros = tuple(parametros)
+        #   uma lista é uma EDO por passo, indexada pelo passo
+        self.por_passo = isinstance(y_linha, (list, tuple))
+        self._funcoes_vetorizadas = None
+        self._jacobianos = None
+        self._derivadas_x = None
+
+        primeira = y_linha[0] if self.por_passo else y_linha
+        self.simbolica = _e_simbolico(primeira) or not callable(primeira)
+        if not self.simbolica:
+            self.dimensao = dimensao
+            self.estados = ()
+        else:
+            from sympy import MatrixBase, symbols
+
+            if isinstance(primeira, MatrixBase):
+                self.dimensao = len(primeira)
+                if estados is None:
+                    estados = symbols(f'y1:{self.dimensao + 1}')
+                self.estados = tuple(estados)
+                if len(self.estados) != self.dimensao:
+                    raise ValueError(f'O sistema tem {self.dimensao} EDOs e {len(self.estados)} estados')
+            else:
+                self.dimensao = None
+                self.estados = (symbols('y'),)
+
+        if self.parametros:
+            self.funcoes = None
+        elif self.por_passo:
+            self.funcoes = [self._compila(edo) for edo in y_linha]
+        else:
+            self.funcoes = [self._compila(y_linha)]
+
+    def __getstate__(self):
+        #   funções geradas pelo lambdify não são serializáveis: outro processo recebe a EDO simbólica e a recompila
+        return {'y_linha': self.y_linha, 'modo': self.modo, 'parametros': self.parametros,
+                'estados': self.estados if self.simbolica and self.dimensao is not None else None,
+                'dimensao': None if self.simbolica else self.dimensao}
+
+    def __setstate__(self, estado):
+        self.__init__(**estado)
+
+    def _compila(self, edo):
+        if self.dimensao is not None:
+            return self._compila_vetorizada(edo)
+        if not self.simbolica:
+            return edo
+
+        from sympy import lambdify, sympify
+
+        x, y = _simbolos()
+        if self.modo == 'subs':
+            return lambda x_n, y_n: float(edo.subs([(x, x_n), (y, y_n)]))
+
+        edo = sympify(edo)
+        if not edo.free_symbols:
+            constante = float(edo)
+            return lambda x_n, y_n: constante
+
+        return lambdify((x, y), edo, 'math')
+
+    def _compila_vetorizada(self, edo):
+        if not self.simbolica:
+            if self.dimensao is None:
+                return edo
+            return lambda x_n, y_n, *valores_parametros: np.asarray(edo(x_n, y_n, *valores_parametros),
+                                                                    dtype=np.float64)
+
+        from sympy import lambdify, sympify
+
+        x, y = _simbolos()
+        if self.dimensao is None:
+            if self.modo == 'subs':
+                simbolos = (x, y) + self.parametros
+                return np.vectorize(lambda *valores: float(edo.subs(list(zip(simbolos, valores)))),
+                                    otypes=[np.float64])
+
+            return lambdify((x, y) + self.parametros, sympify(edo), 'numpy')
+
+        #   sistemas: o estado chega com as componentes no primeiro eixo, (d,) ou (d, trajetórias)
+        componentes = list(edo)
+        if self.modo == 'subs':
+            def funcao(x_n, y_n, *valores_parametros):
+                saida = np.empty(np.shape(y_n))
+                for indice in np.ndindex(saida.shape[1:]):
+                    substituicoes = [(x, x_n)] + [(s, v[indice]) for s, v in zip(self.estados, y_n)]
+                    substituicoes += [(p, np.broadcast_to(v, saida.shape[1:])[indice])
+                                      for p, v in zip(self.parametros, valores_parametros)]
+                    saida[(slice(None),) + indice] = [float(c.subs(substituicoes)) for c in componentes]
+                return saida
+
+            return funcao
+
+        funcao_componentes = lambdify((x, self.estados) + self.parametros, componentes, 'numpy')
+
+        def funcao(x_n, y_n, *valores_parametros):
+            saida = np.empty(np.shape(y_n))
+            #   componentes constantes saem como escalares e são espalhadas pela atribuição
+            for j, componente in enumerate(funcao_componentes(x_n, y_n, *valores_parametros)):
+                saida[j] = componente
+            return saida
+
+        return funcao
+
+    def __call__(self, x_n, y_n, i=0):
+        """
+        Avalia a EDO
+        :param x_n: x do estágio
+        :param y_n: y do estágio (array com d componentes, se for um sistema)
+        :param i: passo atual, usado apenas quando y_linha é uma lista de EDOs
+        :return: valor de y' = f(x_n, y_n)
+        """
+        if self.por_passo:
+            return self.funcoes[i](x_n, y_n)
+        return self.funcoes[0](x_n, y_n)
+
+    def vetorizada(self, x_n, y_n, valores_parametros=(), i=0):
+        """
+        Avalia a EDO para várias trajetórias de uma vez
+        :param x_n: x do estágio
+        :param y_n: array com o y de cada trajetória (d x trajetórias, se for um sistema)
+        :param valores_parametros: um array por símbolo de parametros, com o valor de cada trajetória
+        :param i: passo atual, usado apenas quando y_linha é uma lista de EDOs
+        :return: valores de y' = f(x_n, y_n) (array, ou escalar se a EDO não depende de y nem dos parâmetros)
+        """
+        if self._funcoes_vetorizadas is None:
+            edos = self.y_linha if self.por_passo else [self.y_linha]
+            self._funcoes_vetorizadas = [self._compila_vetorizada(edo) for edo in edos]
+
+        return self._funcoes_vetorizadas[i if self.por_passo else 0](x_n, y_n, *valores_parametros)
+
+    def jacobiano(self, x_n, y_n, i=0):
+        """
+        Avalia a derivada da EDO em relação a y (a matriz jacobiana d x d, para sistemas), usada pelos métodos
+        implícitos. A derivada é obtida com o sympy e compilada uma única vez, no primeiro uso; EDOs dadas como
+        funções python usam diferenças finitas
+        :param x_n: x do estágio
+        :param y_n: y do estágio
+        :param i: passo atual, usado apenas quando y_linha é uma lista de EDOs
+        :return: df/dy em (x_n, y_n) (float, ou array d x d se for um sistema)
+        """
+        if self._jacobianos is None:
+            self._jacobianos = self._compila_derivadas('y')
+        return self._jacobianos[i if self.por_passo else 0](x_n, y_n)
+
+    def derivada_x(self, x_n, y_n, i=0):
+        """
+        Avalia a derivada da EDO em relação a x, usada pelo método de Rosenbrock, compilada como em jacobiano()
+        :param x_n: x do estágio
+        :param y_n: y do estágio
+        :param i: passo atual, usado apenas quando y_linha é uma lista de EDOs
+        :return: df/dx em (x_n, y_n) (float, ou array com d componentes se for um sistema)
+        """
+        if self._derivadas_x is None:
+            self._derivadas_x = self._compila_derivadas('x')
+        return self._derivadas_x[i if self.por_passo else 0](x_n, y_n)
+
+    def _compila_derivadas(self, variavel):
+        edos = self.y_linha if self.por_passo else [self.y_linha]
+        if not self.simbolica:
+            return [_diferencas_finitas(edo, variavel, self.dimensao) for edo in edos]
+
+        from sympy import Matrix, lambdify, sympify
+
+        x, y = _simbolos()
+        derivadas = []
+        for edo in edos:
+            if self.dimensao is None:
+                derivadas.append(self._compila(sympify(edo).diff(y if variavel == 'y' else x)))
+            elif variavel == 'x':
+                derivadas.append(self._compila(Matrix(edo).diff(x)))
+            else:
+                jacobiana = lambdify((x, self.estados), Matrix(edo).jacobian(self.estados), 'numpy')
+                derivadas.append(lambda x_n, y_n, jacobiana=jacobiana: np.array(jacobiana(x_n, y_n),
+                                                                                dtype=np.float64))
+        return derivadas
+
+
+def _diferencas_finitas(edo, variavel, dimensao):
+    #   derivada de uma EDO dada como função python, por diferenças progressivas com passo relativo sqrt(eps)
+    passo_relativo = np.sqrt(np.finfo(np.float64).eps)
+
+    if variavel == 'x':
+        def derivada(x_n, y_n):
+            delta = passo_relativo * max(1.0, abs(x_n))
+            return (np.asarray(edo(x_n + delta, y_n)) - np.asarray(edo(x_n, y_n))) / delta
+    elif dimensao is None:
+        def derivada(x_n, y_n):
+            delta = passo_relativo * max(1.0, abs(y_n))
+            return (edo(x_n, y_n + delta) - edo(x_n, y_n)) / delta
+    else:
+        def derivada(x_n, y_n):
+            base = np.asarray(edo(x_n, y_n), dtype=np.float64)
+            jacobiana = np.empty((dimensao, dimensao))
+            for j in range(dimensao):
+                deslocado = np.array(y_n, dtype=np.float64)
+                delta = passo_relativo * max(1.0, abs(deslocado[j]))
+                deslocado[j] += delta
+                jacobiana[:, j] = (np.asarray(edo(x_n, deslocado), dtype=np.float64) - base) / delta
+            return jacobiana
+
+    return derivada
+
+
+class EdoContada(EdoCompilada):
+    """
+    EdoCompilada que conta quantas vezes é avaliada, usada pela instrumentação (ver Instrumentacao). Repassa as
+    avaliações para edo, reaproveitando as funções já compiladas, e a contagem fica só nesta classe, então a
+    EdoCompilada comum não paga por ela
+    :param edo: EdoCompilada a ser contada
+    """
+
+    def __init__(self, edo):
+        self.__dict__.update(vars(edo))
+        self.edo = edo
+        self.avaliacoes = 0
+
+    def __getstate__(self):
+        return {'edo': self.edo}
+
+    def __setstate__(self, estado):
+        self.__init__(estado['edo'])
+
+    def __call__(self, x_n, y_n, i=0):
+        self.avaliacoes += 1
+        return self.edo(x_n, y_n, i)
+
+    def vetorizada(self, x_n, y_n, valores_parametros=(), i=0):
+        return self.edo.vetorizada(x_n, y_n, valores_parametros, i)
+
+    def jacobiano(self, x_n, y_n, i=0):
+        return self.edo.jacobiano(x_n, y_n, i)
+
+    def derivada_x(self, x_n, y_n, i=0):
+        return self.edo.derivada_x(x_n, y_n, i)
+
+
+class EdoForcante(EdoCompilada):
+    """
+    EDO y' = q(x) que não depende de y, dada pelo valor da forçante q em cada passo (como a vazão líquida gerada por
+    influx.forcante). Equivale a uma lista com uma EDO constante por passo, mas guarda só um array float64, sem
+    passar pelo sympy, então horizontes de milhões de passos cabem na memória e são montados em milissegundos. Uma
+    forçante por trajetória (trajetórias x passos) é avaliada de uma vez por runge_kutta_lote()
+    :param forcante: sequência com o valor de y' em cada passo, ou array 2-D com uma sequência por trajetória
+    """
+
+    def __init__(self, forcante):
+        forcante = np.asarray(forcante, dtype=np.float64)
+        if forcante.ndim not in (1, 2):
+            raise ValueError(f'A forçante deve ter um valor por passo, recebido um array com forma {forcante.shape}')
+
+        #   passos no primeiro eixo, para que os valores das trajetórias em um passo fiquem contíguos
+        self.y_linha = np.ascontiguousarray(forcante.T)
+        self.modo = 'lambdify'
+        self.parametros = ()
+        self.por_passo = True
+        self.simbolica = False
+        self.dimensao = None
+        self.estados = ()
+        #   floats python são mais rápidos de indexar e somar nos laços dos métodos do que escalares numpy
+        self.funcoes = self.y_linha.tolist() if forcante.ndim == 1 else list(self.y_linha)
+
+    def __getstate__(self):
+        return {'forcante': self.y_linha.T}
+
+    def __setstate__(self, estado):
+        self.__init__(estado['forcante'])
+
+    def __call__(self, x_n, y_n, i=0):
+        return self.funcoes[i]
+
+    def vetorizada(self, x_n, y_n, valores_parametros=(), i=0):
+        return self.funcoes[i]
+
+    def jacobiano(self, x_n, y_n, i=0):
+        return 0.0
+
+    def derivada_x(self, x_n, y_n, i=0):
+        return 0.0
+
+
+def _simbolos():
+    from sympy import symbols
+
+    return symbols('x y')
+
+
+def prepara_edo(y_linha, modo='lambdify'):
+    """
+    Garante que a EDO esteja compilada, reaproveitando-a caso já seja uma EdoCompilada
+    :param y_linha: EDO simbolica ou função python, lista de EDOs, EdoCompilada ou array numpy com o valor de y' em
+    cada passo (ver EdoForcante)
+    :param modo: 'lambdify' ou 'subs', ver EdoCompilada
+    :return: EdoCompilada
+    """
+    if isinstance(y_linha, EdoCompilada):
+        return y_linha
+    if isinstance(y_linha, np.ndarray):
+        return EdoForcante(y_linha)
+    return EdoCompilada(y_linha, modo)
+
+
+#   Tabela de Butcher de um método de Runge-Kutta explícito: A (coeficientes dos estágios), b (pesos), c (nós) e,
+#   opcionalmente, b_estrela (pesos do método embutido de ordem menor)
+TabelaButcher = namedtuple('TabelaButcher', ['nome', 'A', 'b', 'c', 'b_estrela', 'ordem'])
+
+TABELAS = {}
+
+
+def registra_tabela(nome, A, b, c, ordem, b_estrela=None):
+    """
+    Registra um método de Runge-Kutta explícito pela sua tabela de Butcher, para ser usado em runge_kutta()
+    :param nome: nome do método
+    :param A: matriz s x s estritamente triangular inferior dos coeficientes dos estágios
+    :param b: pesos dos estágios
+    :param c: nós dos estágios
+    :param ordem: ordem do método
+    :param b_estrela: pesos do método embutido (opcional)
+    :return: TabelaButcher registrada
+    """
+    A = np.array(A, dtype=np.float64)
+    b = np.array(b, dtype=np.float64)
+    c = np.array(c, dtype=np.float64)
+    if b_estrela is not None:
+        b_estrela = np.array(b_estrela, dtype=np.float64)
+
+    s = len(c)
+    if A.shape != (s, s) or len(b) != s or (b_estrela is not None and len(b_estrela) != s):
+        raise ValueError(f'Tabela {nome!r} inconsistente: A deve ser {s}x{s} e b, c com {s} estágios')
+    if np.any(np.triu(A) != 0):
+        raise ValueError(f'Tabela {nome!r} não é explícita: A deve ser estritamente triangular inferior')
+
+    tabela = TabelaButcher(nome, A, b, c, b_estrela, ordem)
+    TABELAS[nome] = tabela
+    return tabela
+
+
+def tabela_seg_ord(alpha):
+    """
+    Tabela de Butcher do método genérico de segunda ordem
+    :param alpha: alpha utlizado
+    :return: TabelaButcher (não registrada)
+    """
+    return TabelaButcher(f'gen_seg_ord_{alpha:g}', np.array([[0, 0], [alpha, 0]], dtype=np.float64),
+                         np.array([1 - 1 / (2 * alpha), 1 / (2 * alpha)]), np.array([0, alpha], dtype=np.float64),
+                         None, 2)
+
+
+registra_tabela('euler', [[0]], [1], [0], 1)
+registra_tabela('euler_mel', [[0, 0], [1, 0]], [1 / 2, 1 / 2], [0, 1], 2)
+registra_tabela('euler_mod', [[0, 0], [1 / 2, 0]], [0, 1], [0, 1 / 2], 2)
+registra_tabela('rk4', [[0, 0, 0, 0], [1 / 2, 0, 0, 0], [0, 1 / 2, 0, 0], [0, 0, 1, 0]],
+                [1 / 6, 1 / 3, 1 / 3, 1 / 6], [0, 1 / 2, 1 / 2, 1], 4)
+registra_tabela('dormand_prince',
+                [[0, 0, 0, 0, 0, 0, 0], [1 / 5, 0, 0, 0, 0, 0, 0], [3 / 40, 9 / 40, 0, 0, 0, 0, 0],
+                 [44 / 45, -56 / 15, 32 / 9, 0, 0, 0, 0],
+                 [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729, 0, 0, 0],
+                 [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656, 0, 0],
+                 [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0]],
+                [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0],
+                [0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1], 5,
+                b_estrela=[5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
+
+#   Interpolante contínuo de quarta ordem do Dormand-Prince: y(xn + s * h) = yn + h * sum_m (sum_j k_j * P_jm) * s^(m+1)
+P_DENSA_DORMAND_PRINCE = np.array([
+    [1, -8048581381 / 2820520608, 8663915743 / 2820520608, -12715105075 / 11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200 / 32700410799, -68118460800 / 10900136933, 87487479700 / 32700410799],
+    [0, -1754552775 / 470086768, 14199869525 / 1410260304, -10690763975 / 1880347072],
+    [0, 127303824393 / 49829197408, -318862633887 / 49829197408, 701980252875 / 199316789632],
+    [0, -282668133 / 205662961, 2019193451 / 616988883, -1453857185 / 822651844],
+    [0, 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423]])
+
+
+def plano_rk(tabela, h):
+    """
+    Pré-calcula, para um passo h fixo, o que cada estágio usa: c_j * h e a linha h * A_j como floats python
+    :param tabela: TabelaButcher
+    :param h: passo
+    :return: lista com uma tupla (c_j * h, h * A_j[:j]) por estágio
+    """
+    return [(float(tabela.c[j] * h), tuple((h * tabela.A[j, :j]).tolist())) for j in range(len(tabela.c))]
+
+
+def estado_inicial(edo, y_zero):
+    """
+    Estado inicial de um método: float python para EDOs escalares, array numpy com d componentes para sistemas
+    :param edo: EdoCompilada
+    :param y_zero: y inicial
+    :return: y inicial
+    """
+    if edo.dimensao is None:
+        return float(y_zero)
+
+    y_zero = np.array(y_zero, dtype=np.float64)
+    if y_zero.shape[:1] != (edo.dimensao,):
+        raise ValueError(f'y_zero deve ter {edo.dimensao} componentes, recebido formato {y_zero.shape}')
+    return y_zero
+
+
+def buffers_rk(edo, tabela, y_zero):
+    """
+    Estado inicial e buffer dos estágios de um método de Runge-Kutta. EDOs escalares usam floats python e uma
+    memoryview float64; sistemas usam arrays numpy, com k[j] sendo o array do estágio j
+    :param edo: EdoCompilada
+    :param tabela: TabelaButcher
+    :param y_zero: y inicial
+    :return: (y inicial, buffer k)
+    """
+    y_zero = estado_inicial(edo, y_zero)
+    if edo.dimensao is None:
+        return y_zero, memoryview(np.zeros(len(tabela.c)))
+    return y_zero, np.zeros((len(tabela.c),) + y_zero.shape)
+
+
+def estagios_rk(edo, plano, x_n, y_n, i, k, inicio=0):
+    """
+    Calcula os estágios k de um passo de Runge-Kutta explícito, escrevendo-os no buffer k
+    :param edo: EdoCompilada
+    :param plano: plano do passo, ver plano_rk()
+    :param x_n: x do passo
+    :param y_n: y do passo
+    :param i: número do passo
+    :param k: buffer dos estágios, ver buffers_rk()
+    :param inicio: primeiro estágio a ser calculado (os anteriores já estão em k, ex.: FSAL)
+    """
+    #   map(mul, ...) para no fim da linha a_h, então cada estágio só enxerga os k já calculados; com um buffer numpy
+    #   cada termo é um array e a mesma soma vale para sistemas
+    for j in range(inicio, len(plano)):
+        c_h, a_h = plano[j]
+        k[j] = edo(x_n + c_h, y_n + sum(map(mul, a_h, k)), i)
+
+
+def runge_kutta(y_zero, x_zero, h, num_repet, y_linha, tabela, modo='lambdify'):
+    """
+    Calcula a EDO utilizando um método de Runge-Kutta explícito qualquer, descrito pela sua tabela de Butcher
+    y(n+1) = yn + h * sum(b_j * k_j), com k_j = f(xn + c_j * h, yn + h * sum(A_jl * k_l))
     :param y_zero: y inicial
     :param x_zero: x inicial
     :param h: passo
     :param num_repet: número de répetições do passo
     :param y_linha: EDO
-    :return: valores de y do Euler
+    :param tabela: TabelaButcher, ou nome de uma tabela registrada em TABELAS
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: valores de y do método ((num_repet + 1) x d, se for um sistema)
     """
-    y_valores = [y_zero]
+    edo = prepara_edo(y_linha, modo)
+    if isinstance(tabela, str):
+        tabela = TABELAS[tabela]
+
+    y_n, k = buffers_rk(edo, tabela, y_zero)
+
+    return _runge_kutta(edo, y_n, k, x_zero, h, num_repet, tabela)
+
+
+def _runge_kutta(f, y_n, k, x_zero, h, num_repet, tabela):
+    y_valores = np.empty((num_repet + 1,) + np.shape(y_n))
+    y_valores[0] = y_n
+
+    for i, (_, y_n) in enumerate(_passos_rk(f, y_n, k, x_zero, h, num_repet, tabela), 1):
+        y_valores[i] = y_n
+
+    return y_valores
+
+
+def _passos_rk(f, y_n, k, x_zero, h, num_repet, tabela):
+    #   gera (x, y) ao fim de cada passo guardando apenas o estado atual; cada y é um objeto novo (float ou array),
+    #   então quem consome pode guardá-lo sem cópia
+    plano = plano_rk(tabela, h)
+    b_h = tuple((h * tabela.b).tolist())
+
     for i in range(num_repet):
         x_n = x_zero + i * h
-        y_n = y_valores[i]
 
-        try:
-            calc_euler = y_n + h * y_linha.subs([(x, x_n), (y, y_n)])
+        estagios_rk(f, plano, x_n, y_n, i, k)
 
-        except AttributeError:
-            calc_euler = y_n + h * y_linha[i].subs([(x, x_n), (y, y_n)])
+        y_n = y_n + sum(map(mul, b_h, k))
+        yield x_zero + (i + 1) * h, y_n
 
-        y_valores.append(round(calc_euler, 15))
 
-    return y_valores
+def runge_kutta_passos(y_zero, x_zero, h, num_repet, y_linha, tabela, modo='lambdify'):
+    """
+    Versão em fluxo de runge_kutta(): gera os pontos conforme são calculados, sem guardar a trajetória, de forma que
+    a memória usada não cresce com num_repet. Os valores são os mesmos de runge_kutta()
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO
+    :param tabela: TabelaButcher, ou nome de uma tabela registrada em TABELAS (ex.: 'euler', 'rk4', 'dormand_prince'
+    para a solução de quinta ordem, ou tabela_seg_ord(alpha))
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: gerador de (x_n, y_n), começando em (x_zero, y_zero) e terminando no passo num_repet
+    """
+    edo = prepara_edo(y_linha, modo)
+    if isinstance(tabela, str):
+        tabela = TABELAS[tabela]
+
+    y_n, k = buffers_rk(edo, tabela, y_zero)
+
+    yield x_zero, y_n
+    yield from _passos_rk(edo, y_n, k, x_zero, h, num_repet, tabela)
+
+
+def runge_kutta_blocos(y_zero, x_zero, h, num_repet, y_linha, tabela, tamanho_bloco=65536, modo='lambdify'):
+    """
+    Versão em fluxo de runge_kutta() que entrega a trajetória em blocos de tamanho fixo, para consumidores que
+    trabalham com arrays (acúmulo de erros, escrita em arquivo, gráficos). Só um bloco fica em memória por vez
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO
+    :param tabela: TabelaButcher, ou nome de uma tabela registrada em TABELAS
+    :param tamanho_bloco: número de pontos de cada bloco (o último pode ser menor)
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: gerador de (x_bloco, y_bloco), arrays com tamanho_bloco pontos consecutivos (tamanho_bloco x d, se for
+    um sistema), cobrindo os num_repet + 1 pontos de runge_kutta()
+    """
+    if tamanho_bloco < 1:
+        raise ValueError(f'tamanho_bloco deve ser positivo, recebido: {tamanho_bloco}')
+
+    passos = runge_kutta_passos(y_zero, x_zero, h, num_repet, y_linha, tabela, modo)
+    x_bloco = y_bloco = None
+    j = 0
+
+    for x_n, y_n in passos:
+        if y_bloco is None:
+            x_bloco = np.empty(tamanho_bloco)
+            y_bloco = np.empty((tamanho_bloco,) + np.shape(y_n))
+        x_bloco[j] = x_n
+        y_bloco[j] = y_n
+        j += 1
+        if j == tamanho_bloco:
+            #   blocos novos a cada entrega, pois o consumidor pode guardar o anterior
+            yield x_bloco, y_bloco
+            x_bloco = y_bloco = None
+            j = 0
+
+    if j:
+        yield x_bloco[:j], y_bloco[:j]
+
+
+def runge_kutta_lote(y_zeros, x_zero, h, num_repet, y_linha, tabela, parametros=None, modo='lambdify'):
+    """
+    Calcula a mesma EDO para várias condições iniciais (e, opcionalmente, vários valores de parâmetros) de uma vez,
+    com a aritmética dos estágios feita em arrays numpy sobre todas as trajetórias
+    :param y_zeros: array com o y inicial de cada trajetória (trajetórias x d, se for um sistema)
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO, que pode conter os símbolos de parametros
+    :param tabela: TabelaButcher, ou nome de uma tabela registrada em TABELAS
+    :param parametros: dict {símbolo: array com o valor de cada trajetória}; escalares valem para todas
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: array 2-D (trajetórias x (num_repet + 1)) com os valores de y de cada trajetória, ou 3-D
+    (trajetórias x (num_repet + 1) x d) para sistemas
+    """
+    parametros = parametros or {}
+    if isinstance(y_linha, EdoCompilada):
+        edo = y_linha
+    else:
+        edo = EdoCompilada(y_linha, modo, parametros=tuple(parametros))
+    if isinstance(tabela, str):
+        tabela = TABELAS[tabela]
+
+    forma_estado = () if edo.dimensao is None else (edo.dimensao,)
+    y_zeros = np.asarray(y_zeros, dtype=np.float64)
+    valores_parametros = [np.asarray(parametros[p], dtype=np.float64) for p in edo.parametros]
+    trajetorias = np.broadcast_shapes(y_zeros.shape[:y_zeros.ndim - len(forma_estado)],
+                                      *(v.shape for v in valores_parametros)) or (1,)
+    if len(trajetorias) != 1:
+        raise ValueError('y_zeros e os parâmetros devem ter um valor (ou estado) por trajetória')
+    valores_parametros = [np.broadcast_to(v, trajetorias) for v in valores_parametros]
 
+    #   as trajetórias ficam no último eixo, pois a EDO vetorizada recebe as componentes do estado no primeiro
+    y_n = np.moveaxis(np.broadcast_to(y_zeros, trajetorias + forma_estado), 0, -1).copy()
+    k = np.zeros((len(tabela.c),) + y_n.shape)
 
-def euler_mel(y_zero, x_zero, h, num_repet, y_linha):
+    def f(x_n, y_estagio, i):
+        return edo.vetorizada(x_n, y_estagio, valores_parametros, i)
+
+    y_valores = _runge_kutta(f, y_n, k, x_zero, h, num_repet, tabela)
+
+    return np.ascontiguousarray(np.moveaxis(y_valores, -1, 0))
+
+
+def euler(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify'):
+    """
+    Calula a EDO utilizando o método de Euler
+    euler => y(n+1) = yn + hf(xn, yn)
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: valores de y do Euler
+    """
+    return runge_kutta(y_zero, x_zero, h, num_repet, y_linha, 'euler', modo)
+
+
+def euler_mel(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify'):
     """
     Calula a EDO utilizando o método de Euler melhorado
     euler_mel => y(n+1) = yn + (h/2) [f(xn, yn) + f(xn + h, yn + hf(xn, yn))]
@@ -44,368 +680,1530 @@ def euler_mel(y_zero, x_zero, h, num_repet, y_linha):
     :param h: passo
     :param num_repet: número de répetições do passo
     :param y_linha: EDO
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
     :return: valores de y do Euler melhorado
     """
-    y_valores = [y_zero]
+    return runge_kutta(y_zero, x_zero, h, num_repet, y_linha, 'euler_mel', modo)
+
+
+def euler_mod(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify'):
+    """
+    Calula a EDO utilizando o método de Euler modificado
+    euler_mod => y(n+1) = yn + hf(xn + h/2, yn + h/2 * f(xn, yn))
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: valores de y do Euler modificado
+    """
+    return runge_kutta(y_zero, x_zero, h, num_repet, y_linha, 'euler_mod', modo)
+
+
+def gen_seg_ord_alfa(y_zero, x_zero, h, num_repet, y_linha, alpha, modo='lambdify'):
+    """
+    Calula a EDO utilizando o método genérico de segunda ordem com alfa 1/3 e 1/4
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO
+    :param alpha: alpha utlizado
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: Valores de y do genérico de segunda ordem
+    """
+    return runge_kutta(y_zero, x_zero, h, num_repet, y_linha, tabela_seg_ord(alpha), modo)
+
+
+def dormand_prince_embutido(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify'):
+    """
+    Calcula a EDO com Dormand-Prince em uma única passagem: os mesmos 7 estágios de cada passo dão a solução de
+    quinta ordem, a de quarta ordem e a estimativa do erro local. Como a última linha de A é igual a b, o k7 de um
+    passo é o k1 do seguinte (FSAL), então cada passo custa 6 avaliações da EDO
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: (valores de y de quinta ordem, valores de y de quarta ordem partindo da solução de quinta ordem,
+    erro local estimado y5 - y4 de cada passo)
+    """
+    edo = prepara_edo(y_linha, modo)
+    tabela = TABELAS['dormand_prince']
+
+    y_n, k = buffers_rk(edo, tabela, y_zero)
+    y_quinta = np.empty((num_repet + 1,) + np.shape(y_n))
+    y_quarta = np.empty_like(y_quinta)
+    erro = np.zeros_like(y_quinta)
+    y_quinta[0] = y_quarta[0] = y_n
+
+    plano = plano_rk(tabela, h)
+    b_h = tuple((h * tabela.b).tolist())
+    e_h = tuple((h * (tabela.b - tabela.b_estrela)).tolist())
+    #   com uma EDO por passo, o k7 foi avaliado com a EDO do passo anterior e não serve de k1
+    fsal = not edo.por_passo
+
+    k[0] = edo(x_zero, y_n, 0)
     for i in range(num_repet):
         x_n = x_zero + i * h
-        y_n = y_valores[i]
 
-        try:
-            calc_euler_mel = y_n + (h / 2) * (y_linha.subs([(x, x_n), (y, y_n)]) +
-                                              y_linha.subs([(x, x_n + h),
-                                                            (y, y_n + h * y_linha.subs([(x, x_n), (y, y_n)]))]))
-        except AttributeError:
-            calc_euler_mel = y_n + (h / 2) * (y_linha[i].subs([(x, x_n), (y, y_n)]) +
-                                              y_linha[i].subs([(x, x_n + h),
-                                                               (y, y_n + h * y_linha[i].subs([(x, x_n), (y, y_n)]))]))
+        if i > 0:
+            k[0] = k[6] if fsal else edo(x_n, y_n, i)
+        estagios_rk(edo, plano, x_n, y_n, i, k, inicio=1)
 
-        y_valores.append(round(calc_euler_mel, 15))
+        erro_n = sum(map(mul, e_h, k))
+        y_n = y_n + sum(map(mul, b_h, k))
 
-    return y_valores
+        y_quarta[i + 1] = y_n - erro_n
+        erro[i + 1] = erro_n
+        y_quinta[i + 1] = y_n
+
+    return y_quinta, y_quarta, erro
 
 
-def euler_mod(y_zero, x_zero, h, num_repet, y_linha):
+def dormand_price_fixo(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify', passagem_unica=False):
     """
-    Calula a EDO utilizando o método de Euler modificado
-    euler_mod => y(n+1) = yn + hf(xn + h/2, yn + h/2 * f(xn, yn))
+    Calula a EDO utilizando o método de Dormand=Price
     :param y_zero: y inicial
     :param x_zero: x inicial
     :param h: passo
     :param num_repet: número de répetições do passo
     :param y_linha: EDO
-    :return: valores de y do Euler modificado
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :param passagem_unica: se True, usa dormand_prince_embutido(), com metade das avaliações da EDO
+    :return: valores de y do de dormand_price fixo
     """
-    y_valores = [y_zero]
+    edo = prepara_edo(y_linha, modo)
+    tabela = TABELAS['dormand_prince']
+
+    if passagem_unica:
+        return dormand_prince_embutido(y_zero, x_zero, h, num_repet, edo)[1]
+
+    #   primeira passagem: solução de quinta ordem (pesos b)
+    y_valores2 = runge_kutta(y_zero, x_zero, h, num_repet, edo, tabela)
+
+    #   segunda passagem: pesos de quarta ordem (b_estrela) aplicados a partir da solução de quinta ordem
+    y_n, k = buffers_rk(edo, tabela, y_zero)
+    y_valores = np.empty_like(y_valores2)
+    y_valores[0] = y_n
+    plano = plano_rk(tabela, h)
+    b_estrela_h = tuple((h * tabela.b_estrela).tolist())
+    #   floats python no caso escalar, como em buffers_rk()
+    y_valores2 = list(y_valores2) if edo.dimensao is not None else y_valores2.tolist()
+
     for i in range(num_repet):
         x_n = x_zero + i * h
-        y_n = y_valores[i]
 
-        try:
-            calc_euler_mod = y_n + h * y_linha.subs([(x, x_n + (h / 2)),
-                                                     (y, y_n + ((h / 2) * y_linha.subs([(x, x_n), (y, y_n)])))])
-        except AttributeError:
-            calc_euler_mod = y_n + h * y_linha[i].subs([(x, x_n + (h / 2)),
-                                                        (y, y_n + ((h / 2) * y_linha[i].subs([(x, x_n), (y, y_n)])))])
+        estagios_rk(edo, plano, x_n, y_n, i, k)
 
-        y_valores.append(round(calc_euler_mod, 15))
+        y_n = y_valores2[i] + sum(map(mul, b_estrela_h, k))
+        y_valores[i + 1] = y_n
 
     return y_valores
 
 
-def gen_seg_ord_alfa(y_zero, x_zero, h, num_repet, y_linha, alpha):
+class SolucaoDensa:
     """
-    Calula a EDO utilizando o método genérico de segunda ordem com alfa 1/3 e 1/4
+    Solução contínua de um método adaptativo: guarda, para cada passo aceito, o x e o y iniciais, o tamanho do passo
+    e os coeficientes do interpolante, e avalia y em quaisquer pontos sem novos passos de integração
+    :param x_inicio: x inicial de cada passo aceito
+    :param y_inicio: y inicial de cada passo aceito
+    :param passos: tamanho de cada passo aceito
+    :param coeficientes: array (passos x grau), ou (passos x grau x d) para sistemas, com os coeficientes do
+    polinômio em s = (x - xn) / h de cada passo
+    """
+
+    def __init__(self, x_inicio, y_inicio, passos, coeficientes):
+        self.x_inicio = np.asarray(x_inicio, dtype=np.float64)
+        self.y_inicio = np.asarray(y_inicio, dtype=np.float64)
+        self.passos = np.asarray(passos, dtype=np.float64)
+        #   grau no primeiro eixo, para que coeficientes[m][passo] tenha o formato de y_inicio[passo]
+        self.coeficientes = np.moveaxis(np.asarray(coeficientes, dtype=np.float64), 1, 0)
+
+    def __call__(self, x_consulta):
+        """
+        Avalia a solução
+        :param x_consulta: x ou conjunto de x dentro do intervalo integrado
+        :return: array float64 com os valores de y (com as d componentes no último eixo, se for um sistema)
+        """
+        x_consulta = np.asarray(x_consulta, dtype=np.float64)
+        passo = np.clip(np.searchsorted(self.x_inicio, x_consulta, side='right') - 1, 0, len(self.x_inicio) - 1)
+
+        h = self.passos[passo]
+        s = (x_consulta - self.x_inicio[passo]) / h
+        if self.y_inicio.ndim > 1:
+            h = h[..., None]
+            s = s[..., None]
+
+        #   Horner em s, o polinômio não tem termo independente
+        q = self.coeficientes[:, passo]
+        soma = q[-1]
+        for m in range(len(q) - 2, -1, -1):
+            soma = soma * s + q[m]
+
+        return self.y_inicio[passo] + h * soma * s
+
+
+def edo_no_tempo(edo, x_zero, h):
+    """
+    Adapta a EdoCompilada para integradores externos que não andam na grade x_zero + i * h: quando a EDO é uma lista
+    com uma EDO por passo, o passo i é obtido do próprio x
+    :param edo: EdoCompilada
+    :param x_zero: x inicial da grade
+    :param h: passo da grade
+    :return: função f(x, y)
+    """
+    if not edo.por_passo:
+        return edo
+
+    ultimo = len(edo.y_linha) - 1
+
+    def f(x_n, y_n):
+        return edo(x_n, y_n, min(max(int((x_n - x_zero) / h + 1e-9), 0), ultimo))
+
+    return f
+
+
+def dormand_prince_adaptativo(y_zero, x_zero, h, num_repet, y_linha, rtol=1e-3, atol=1e-6, h_max=inf,
+                              modo='lambdify', densa=False):
+    """
+    Calcula a EDO usando Dormand-Prince 5(4) com passos adaptativos, no intervalo [x_zero, x_zero + h * num_repet].
+    O erro local de cada passo vem do par embutido e o passo é aceito quando
+    |erro| <= atol + rtol * max(|yn|, |y(n+1)|) (para sistemas, na média quadrática das componentes); o próximo passo
+    é h * 0.9 * erro^(-1/5), limitado entre h/5 e 10h.
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: primeiro passo (e passo da grade, caso y_linha seja uma lista com uma EDO por passo)
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO
+    :param rtol: tolerância relativa
+    :param atol: tolerância absoluta
+    :param h_max: maior passo permitido
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :param densa: se True, guarda o interpolante de cada passo aceito (P_DENSA_DORMAND_PRINCE)
+    :return: [valores de x, valores de y, estatísticas, solução densa] sendo os valores arrays float64, as
+    estatísticas um dict com o número de passos 'aceitos', 'rejeitados' e de 'avaliacoes' da EDO, e a solução densa
+    uma SolucaoDensa (None se densa=False). Para sistemas, cada valor de y é um array com as d componentes
+    """
+    #   o controle de passo e a solução densa só andam para a frente
+    if not h > 0:
+        raise ValueError(f'O passo adaptativo só integra para a frente: h deve ser positivo, recebido: {h}')
+    if num_repet < 1:
+        raise ValueError(f'num_repet deve ser pelo menos 1, recebido: {num_repet}')
+
+    edo = prepara_edo(y_linha, modo)
+    tabela = TABELAS['dormand_prince']
+    escalar = edo.dimensao is None
+
+    linhas = [tabela.A[j, :j].tolist() for j in range(len(tabela.c))]
+    c = tabela.c.tolist()
+    b = tabela.b.tolist()
+    e = (tabela.b - tabela.b_estrela).tolist()
+    colunas_densa = P_DENSA_DORMAND_PRINCE.T.tolist()
+    coeficientes = []
+    passos = []
+
+    x_final = x_zero + h * num_repet
+    x_n = float(x_zero)
+    y_n, k = buffers_rk(edo, tabela, y_zero)
+    x_valores = [x_n]
+    y_valores = [y_n]
+
+    #   com uma EDO por passo da grade, nenhum passo adaptativo atravessa x_zero + (i + 1) * h, assim todos os
+    #   estágios usam a EDO i, como nos métodos de passo fixo
+    i = 0
+    k[0] = edo(x_n, y_n, i)
+    avaliacoes = 1
+    aceitos = 0
+    rejeitados = 0
+
+    passo = min(h, h_max)
+    rejeitou = False
+    while x_n < x_final:
+        limite = min(x_zero + (i + 1) * h, x_final) if edo.por_passo else x_final
+        ultimo = passo >= limite - x_n
+        if ultimo:
+            passo = limite - x_n
+        if x_n + passo == x_n:
+            raise RuntimeError(f'Passo adaptativo menor que a precisão numérica em x = {x_n}')
+
+        for j in range(1, len(c)):
+            k[j] = edo(x_n + c[j] * passo, y_n + passo * sum(map(mul, linhas[j], k)), i)
+        avaliacoes += len(c) - 1
+
+        y_prox = y_n + passo * sum(map(mul, b, k))
+        if escalar:
+            erro = abs(passo * sum(map(mul, e, k))) / (atol + rtol * max(abs(y_n), abs(y_prox)))
+        else:
+            escala = atol + rtol * np.maximum(np.abs(y_n), np.abs(y_prox))
+            erro = float(np.sqrt(np.mean(np.square(passo * sum(map(mul, e, k)) / escala))))
+
+        if erro <= 1:
+            if densa:
+                passos.append(passo)
+                coeficientes.append([sum(map(mul, coluna, k)) for coluna in colunas_densa])
+
+            x_n = limite if ultimo else x_n + passo
+            y_n = y_prox
+            x_valores.append(x_n)
+            y_valores.append(y_n)
+            aceitos += 1
+
+            if edo.por_passo and ultimo and x_n < x_final:
+                i += 1
+                k[0] = edo(x_n, y_n, i)
+                avaliacoes += 1
+            else:
+                #   FSAL: o último estágio foi avaliado em (x(n+1), y(n+1))
+                k[0] = k[len(c) - 1]
+
+            fator = 10 if erro == 0 else min(10, 0.9 * erro ** -0.2)
+            if rejeitou:
+                fator = min(fator, 1)
+            rejeitou = False
+        else:
+            rejeitados += 1
+            fator = max(0.2, 0.9 * erro ** -0.2)
+            rejeitou = True
+
+        passo = min(passo * fator, h_max)
+
+    estatisticas = {'aceitos': aceitos, 'rejeitados': rejeitados, 'avaliacoes': avaliacoes}
+    x_valores = np.array(x_valores)
+    y_valores = np.array(y_valores)
+    solucao_densa = SolucaoDensa(x_valores[:-1], y_valores[:-1], passos, coeficientes) if densa else None
+
+    return [x_valores, y_valores, estatisticas, solucao_densa]
+
+
+def dormand_price_adap(y_zero, x_zero, h, num_repet, y_linha, rtol=1e-3, atol=1e-6, modo='lambdify', scipy=False,
+                       densa=False):
+    """
+    Calcula a EDO usando Dormand-Price com passos adaptativos
     :param y_zero: y inicial
     :param x_zero: x inicial
     :param h: passo
     :param num_repet: número de répetições do passo
     :param y_linha: EDO
-    :param alpha: alpha utlizado
-    :return: Valores de y do genérico de segunda ordem
+    :param rtol: tolerância relativa
+    :param atol: tolerância absoluta
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :param scipy: se True, integra com scipy.integrate.solve_ivp (RK45) em vez de dormand_prince_adaptativo()
+    :param densa: se True, também retorna a solução contínua, que pode ser avaliada em qualquer conjunto de x
+    :return: valores de y e x de dormand_price adaptativo, as estatísticas do passo adaptativo e a solução densa
+    (None se densa=False)
     """
-    c = [0, alpha]
-    b = [1 - 1 / (2 * alpha), 1 / (2 * alpha)]
+    if not scipy:
+        return dormand_prince_adaptativo(y_zero, x_zero, h, num_repet, y_linha, rtol, atol, modo=modo, densa=densa)
+
+    from scipy.integrate import solve_ivp
+
+    edo = prepara_edo(y_linha, modo)
+    f = edo_no_tempo(edo, x_zero, h)
+    escalar = edo.dimensao is None
+
+    def dy_dt(t, y):
+        return [f(t, y[0])] if escalar else f(t, y)
+
+    sol = solve_ivp(dy_dt, [x_zero, x_zero + h * num_repet], np.atleast_1d(np.asarray(y_zero, dtype=np.float64)),
+                    first_step=h, rtol=rtol, atol=atol, max_step=h if edo.por_passo else inf, dense_output=densa)
+
+    sol_t = sol.t
+    sol_y = sol.y[0] if escalar else np.ascontiguousarray(sol.y.T)
+
+    #   RK45 do scipy avalia a EDO uma vez no início e 6 vezes por tentativa de passo (FSAL)
+    aceitos = len(sol_t) - 1
+    estatisticas = {'aceitos': aceitos, 'rejeitados': (sol.nfev - 1) // 6 - aceitos, 'avaliacoes': sol.nfev}
+
+    if densa:
+        def solucao_densa(x_consulta):
+            return sol.sol(x_consulta)[0] if escalar else np.moveaxis(sol.sol(x_consulta), 0, -1)
+    else:
+        solucao_densa = None
+
+    valores = [sol_t, sol_y, estatisticas, solucao_densa]
+
+    return valores
+
+
+def _resolve_newton(edo, x_n, z, constante, h_gama, i, tolerancia, max_iteracoes):
+    #   resolve z = constante + h_gama * f(x_n, z) pelo método de Newton, partindo de z, com a jacobiana reavaliada a
+    #   cada iteração
+    escalar = edo.dimensao is None
+    for _ in range(max_iteracoes):
+        residuo = z - constante - h_gama * edo(x_n, z, i)
+        if escalar:
+            derivada = 1 - h_gama * edo.jacobiano(x_n, z, i)
+            if derivada == 0:
+                raise RuntimeError(f'Iteração de Newton singular no passo {i} (x = {x_n})')
+            correcao = residuo / derivada
+            z = z - correcao
+            convergiu = abs(correcao) <= tolerancia * (1 + abs(z))
+        else:
+            try:
+                correcao = np.linalg.solve(np.eye(len(z)) - h_gama * edo.jacobiano(x_n, z, i), residuo)
+            except np.linalg.LinAlgError:
+                raise RuntimeError(f'Iteração de Newton singular no passo {i} (x = {x_n})') from None
+            z = z - correcao
+            convergiu = np.max(np.abs(correcao)) <= tolerancia * (1 + np.max(np.abs(z)))
+        if convergiu:
+            return z
+
+    raise RuntimeError(f'O método de Newton não convergiu em {max_iteracoes} iterações no passo {i} (x = {x_n})')
+
+
+def _implicito(y_zero, x_zero, h, num_repet, y_linha, metodo, modo, tolerancia, max_iteracoes):
+    #   os três métodos resolvem, a cada passo, y(n+1) = constante + h_gama * f(x(n+1), y(n+1))
+    edo = prepara_edo(y_linha, modo)
+    y_n = estado_inicial(edo, y_zero)
+    y_valores = np.empty((num_repet + 1,) + np.shape(y_n))
+    y_valores[0] = y_n
+    y_anterior = None
 
-    y_valores = [y_zero]
     for i in range(num_repet):
         x_n = x_zero + i * h
-        y_n = y_valores[i]
 
-        try:
-            rk_2 = y_n + h * (b[0] * y_linha.subs([(x, x_n), (y, y_n)]) + b[1] * y_linha.subs(
-                [(x, x_n + c[1] * h), (y, y_n + h * alpha * y_linha.subs([(x, x_n), (y, y_n)]))]))
-        except AttributeError:
-            rk_2 = y_n + h * (b[0] * y_linha[i].subs([(x, x_n), (y, y_n)]) + b[1] * y_linha[i].subs(
-                [(x, x_n + c[1] * h), (y, y_n + h * alpha * y_linha[i].subs([(x, x_n), (y, y_n)]))]))
+        if metodo == 'euler_implicito':
+            constante, h_gama = y_n, h
+        elif metodo == 'trapezio' or i == 0:
+            #   o BDF2 precisa de dois pontos: o primeiro passo é dado pelo trapézio, também de segunda ordem
+            constante, h_gama = y_n + h / 2 * edo(x_n, y_n, i), h / 2
+        else:
+            constante, h_gama = (4 * y_n - y_anterior) / 3, 2 * h / 3
 
-        y_valores.append(round(rk_2, 15))
+        y_anterior, y_n = y_n, _resolve_newton(edo, x_n + h, y_n, constante, h_gama, i, tolerancia, max_iteracoes)
+        y_valores[i + 1] = y_n
 
     return y_valores
 
 
-def dormand_price_fixo(y_zero, x_zero, h, num_repet, y_linha):
+def euler_implicito(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify', tolerancia=1e-10, max_iteracoes=20):
     """
-    Calula a EDO utilizando o método de Dormand=Price
+    Calcula a EDO utilizando o método de Euler implícito, de primeira ordem e L-estável
+    euler implícito => y(n+1) = yn + hf(x(n+1), y(n+1)), resolvido pelo método de Newton com a jacobiana de
+    EdoCompilada.jacobiano()
     :param y_zero: y inicial
     :param x_zero: x inicial
     :param h: passo
     :param num_repet: número de répetições do passo
     :param y_linha: EDO
-    :return: valores de y do de dormand_price fixo
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :param tolerancia: tolerância relativa da correção de Newton
+    :param max_iteracoes: número máximo de iterações de Newton por passo
+    :return: valores de y do método de euler implícito
     """
-    matriz = [[0, 0, 0, 0, 0, 0, 0], [1 / 5, 0, 0, 0, 0, 0, 0], [3 / 40, 9 / 40, 0, 0, 0, 0, 0],
-              [44 / 45, -56 / 15, 32 / 9, 0, 0, 0, 0], [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729, 0, 0, 0],
-              [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656, 0, 0],
-              [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0]]
+    return _implicito(y_zero, x_zero, h, num_repet, y_linha, 'euler_implicito', modo, tolerancia, max_iteracoes)
 
-    c = [0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1]
-    b2 = matriz[6]
 
-    y_valores2 = [y_zero]
+def trapezio(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify', tolerancia=1e-10, max_iteracoes=20):
+    """
+    Calcula a EDO utilizando a regra do trapézio implícita, de segunda ordem e A-estável
+    trapézio => y(n+1) = yn + h/2 * (f(xn, yn) + f(x(n+1), y(n+1))), resolvido pelo método de Newton
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :param tolerancia: tolerância relativa da correção de Newton
+    :param max_iteracoes: número máximo de iterações de Newton por passo
+    :return: valores de y do método do trapézio
+    """
+    return _implicito(y_zero, x_zero, h, num_repet, y_linha, 'trapezio', modo, tolerancia, max_iteracoes)
 
-    try:
-        for i in range(num_repet):
-            x_n = x_zero + i * h
-            y_n2 = y_valores2[i]
-
-            k1 = y_linha.subs([(x, x_n + c[0] * h), (y, y_n2)])
-            k2 = y_linha.subs([(x, x_n + c[1] * h), (y, y_n2 + h * matriz[1][0] * k1)])
-            k3 = y_linha.subs([(x, x_n + c[2] * h), (y, y_n2 + h * (matriz[2][0] * k1 + matriz[2][1] * k2))])
-            k4 = y_linha.subs(
-                [(x, x_n + c[3] * h), (y, y_n2 + h * (matriz[3][0] * k1 + matriz[3][1] * k2 + matriz[3][2] * k3))])
-            k5 = y_linha.subs(
-                [(x, x_n + c[4] * h),
-                 (y, y_n2 + h * (matriz[4][0] * k1 + matriz[4][1] * k2 + matriz[4][2] * k3 + matriz[4][3] * k4))])
-            k6 = y_linha.subs([(x, x_n + c[5] * h),
-                               (y,
-                                y_n2 + h * (matriz[5][0] * k1 + matriz[5][1] * k2 + matriz[5][2] * k3 + matriz[5][
-                                    3] * k4 +
-                                            matriz[5][4] * k5))])
-            k7 = y_linha.subs([(x, x_n + c[6] * h), (
-                y,
-                y_n2 + h * (matriz[6][0] * k1 + matriz[6][1] * k2 + matriz[6][2] * k3 + matriz[6][3] * k4 + matriz[6][
-                    4] * k5 + matriz[6][5] * k6))])
-
-            dp2 = y_n2 + h * (b2[0] * k1 + b2[1] * k2 + b2[2] * k3 + b2[3] * k4 + b2[4] * k5 + b2[5] * k6 + b2[6] * k7)
-
-            y_valores2.append(round(dp2, 15))
-
-        b = [5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40]
-
-        y_valores = [y_zero]
-
-        for i in range(num_repet):
-            x_n = x_zero + i * h
-            y_n = y_valores[i]
-
-            k1 = y_linha.subs([(x, x_n + c[0] * h), (y, y_n)])
-            k2 = y_linha.subs([(x, x_n + c[1] * h), (y, y_n + h * matriz[1][0] * k1)])
-            k3 = y_linha.subs([(x, x_n + c[2] * h), (y, y_n + h * (matriz[2][0] * k1 + matriz[2][1] * k2))])
-            k4 = y_linha.subs(
-                [(x, x_n + c[3] * h), (y, y_n + h * (matriz[3][0] * k1 + matriz[3][1] * k2 + matriz[3][2] * k3))])
-            k5 = y_linha.subs(
-                [(x, x_n + c[4] * h),
-                 (y, y_n + h * (matriz[4][0] * k1 + matriz[4][1] * k2 + matriz[4][2] * k3 + matriz[4][3] * k4))])
-            k6 = y_linha.subs([(x, x_n + c[5] * h),
-                               (
-                                   y, y_n + h * (matriz[5][0] * k1 + matriz[5][1] * k2 + matriz[5][2] * k3 + matriz[5][
-                                       3] * k4 +
-                                                 matriz[5][4] * k5))])
-            k7 = y_linha.subs([(x, x_n + c[6] * h), (
-                y, y_n + h * (matriz[6][0] * k1 + matriz[6][1] * k2 + matriz[6][2] * k3 + matriz[6][3] * k4 + matriz[6][
-                    4] * k5 + matriz[6][5] * k6))])
-
-            dp = y_valores2[i] + h * (b[0] * k1 + b[1] * k2 + b[2] * k3 + b[3] * k4 + b[4] * k5 + b[5] * k6 + b[6] * k7)
-
-            y_valores.append(round(dp, 15))
-    except AttributeError:
-        for i in range(num_repet):
-            x_n = x_zero + i * h
-            y_n2 = y_valores2[i]
-
-            k1 = y_linha[i].subs([(x, x_n + c[0] * h), (y, y_n2)])
-            k2 = y_linha[i].subs([(x, x_n + c[1] * h), (y, y_n2 + h * matriz[1][0] * k1)])
-            k3 = y_linha[i].subs([(x, x_n + c[2] * h), (y, y_n2 + h * (matriz[2][0] * k1 + matriz[2][1] * k2))])
-            k4 = y_linha[i].subs(
-                [(x, x_n + c[3] * h), (y, y_n2 + h * (matriz[3][0] * k1 + matriz[3][1] * k2 + matriz[3][2] * k3))])
-            k5 = y_linha[i].subs(
-                [(x, x_n + c[4] * h),
-                 (y, y_n2 + h * (matriz[4][0] * k1 + matriz[4][1] * k2 + matriz[4][2] * k3 + matriz[4][3] * k4))])
-            k6 = y_linha[i].subs([(x, x_n + c[5] * h),
-                                  (y,
-                                   y_n2 + h * (matriz[5][0] * k1 + matriz[5][1] * k2 + matriz[5][2] * k3 + matriz[5][
-                                       3] * k4 +
-                                               matriz[5][4] * k5))])
-            k7 = y_linha[i].subs([(x, x_n + c[6] * h), (
-                y,
-                y_n2 + h * (matriz[6][0] * k1 + matriz[6][1] * k2 + matriz[6][2] * k3 + matriz[6][3] * k4 + matriz[6][
-                    4] * k5 + matriz[6][5] * k6))])
-
-            dp2 = y_n2 + h * (b2[0] * k1 + b2[1] * k2 + b2[2] * k3 + b2[3] * k4 + b2[4] * k5 + b2[5] * k6 + b2[6] * k7)
-
-            y_valores2.append(round(dp2, 15))
-
-        b = [5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40]
-
-        y_valores = [y_zero]
-
-        for i in range(num_repet):
-            x_n = x_zero + i * h
-            y_n = y_valores[i]
-
-            k1 = y_linha[i].subs([(x, x_n + c[0] * h), (y, y_n)])
-            k2 = y_linha[i].subs([(x, x_n + c[1] * h), (y, y_n + h * matriz[1][0] * k1)])
-            k3 = y_linha[i].subs([(x, x_n + c[2] * h), (y, y_n + h * (matriz[2][0] * k1 + matriz[2][1] * k2))])
-            k4 = y_linha[i].subs(
-                [(x, x_n + c[3] * h), (y, y_n + h * (matriz[3][0] * k1 + matriz[3][1] * k2 + matriz[3][2] * k3))])
-            k5 = y_linha[i].subs(
-                [(x, x_n + c[4] * h),
-                 (y, y_n + h * (matriz[4][0] * k1 + matriz[4][1] * k2 + matriz[4][2] * k3 + matriz[4][3] * k4))])
-            k6 = y_linha[i].subs([(x, x_n + c[5] * h),
-                                  (
-                                      y,
-                                      y_n + h * (matriz[5][0] * k1 + matriz[5][1] * k2 + matriz[5][2] * k3 + matriz[5][
-                                          3] * k4 +
-                                                 matriz[5][4] * k5))])
-            k7 = y_linha[i].subs([(x, x_n + c[6] * h), (
-                y, y_n + h * (matriz[6][0] * k1 + matriz[6][1] * k2 + matriz[6][2] * k3 + matriz[6][3] * k4 + matriz[6][
-                    4] * k5 + matriz[6][5] * k6))])
-
-            dp = y_valores2[i] + h * (b[0] * k1 + b[1] * k2 + b[2] * k3 + b[3] * k4 + b[4] * k5 + b[5] * k6 + b[6] * k7)
-
-            y_valores.append(round(dp, 15))
 
-    return y_valores
+def bdf2(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify', tolerancia=1e-10, max_iteracoes=20):
+    """
+    Calcula a EDO utilizando a fórmula de diferenças regressivas de segunda ordem (BDF2), L-estável
+    bdf2 => y(n+1) = 4/3 yn - 1/3 y(n-1) + 2/3 hf(x(n+1), y(n+1)), com o primeiro passo dado pelo trapézio,
+    resolvido pelo método de Newton
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :param tolerancia: tolerância relativa da correção de Newton
+    :param max_iteracoes: número máximo de iterações de Newton por passo
+    :return: valores de y do BDF2
+    """
+    return _implicito(y_zero, x_zero, h, num_repet, y_linha, 'bdf2', modo, tolerancia, max_iteracoes)
 
 
-def dormand_price_adap(y_zero, x_zero, h, num_repet, contador):
+def rosenbrock(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify'):
     """
-    Calcula a EDO usando Dormand-Price com passos adaptativos
+    Calcula a EDO utilizando o método de Rosenbrock ROS2 (Verwer et al.), de segunda ordem e L-estável. É linearmente
+    implícito: cada passo resolve dois sistemas lineares com a mesma matriz W = I - gama * h * J, sem iterações de
+    Newton, com gama = 1 + 1/sqrt(2)
+    W k1 = hf(xn, yn) + gama * h² * df/dx
+    W k2 = hf(xn + h, yn + k1) - 2 * gama * h * J k1 - gama * h² * df/dx
+    y(n+1) = yn + (k1 + k2) / 2
     :param y_zero: y inicial
     :param x_zero: x inicial
     :param h: passo
     :param num_repet: número de répetições do passo
-    :param contador: contador
-    :return: valores de y e x de dormand_price adaptativo
+    :param y_linha: EDO
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: valores de y do método de Rosenbrock
     """
+    edo = prepara_edo(y_linha, modo)
+    y_n = estado_inicial(edo, y_zero)
+    y_valores = np.empty((num_repet + 1,) + np.shape(y_n))
+    y_valores[0] = y_n
+    gama = 1 + 1 / np.sqrt(2)
+    escalar = edo.dimensao is None
 
-    if contador == 1:
-        def dy_dt(t, y):
-            return -y
-    elif contador == 2:
-        def dy_dt(t, y):
-            return (t + y + 1) / (2 * t)
-    else:
-        def dy_dt(t, y):
-            return y * (pow(t, 2) - 1)
+    for i in range(num_repet):
+        x_n = x_zero + i * h
+
+        jacobiano = edo.jacobiano(x_n, y_n, i)
+        termo_x = gama * h * h * edo.derivada_x(x_n, y_n, i)
 
-    sol = solve_ivp(dy_dt, [x_zero, x_zero + h * num_repet], [y_zero], first_step=h)
+        if escalar:
+            w = 1 - gama * h * jacobiano
+            k1 = (h * edo(x_n, y_n, i) + termo_x) / w
+            k2 = (h * edo(x_n + h, y_n + k1, i) - 2 * gama * h * jacobiano * k1 - termo_x) / w
+        else:
+            w = np.eye(len(y_n)) - gama * h * jacobiano
+            k1 = np.linalg.solve(w, h * edo(x_n, y_n, i) + termo_x)
+            k2 = np.linalg.solve(w, h * edo(x_n + h, y_n + k1, i) - 2 * gama * h * (jacobiano @ k1) - termo_x)
 
-    sol_t = list(sol.t)
-    sol_y = list(sol.y[0])
+        y_n = y_n + (k1 + k2) / 2
+        y_valores[i + 1] = y_n
 
-    for i in range(len(sol_t)):
-        sol_t[i] = round(sol_t[i], 15)
-        sol_y[i] = round(sol_y[i], 15)
+    return y_valores
 
-    valores = [sol_t, sol_y]
 
-    return valores
+#   métodos implícitos que podem ser acrescentados aos de calcula_metodos()
+METODOS_IMPLICITOS = {'euler_implicito': euler_implicito, 'trapezio': trapezio, 'bdf2': bdf2, 'rosenbrock': rosenbrock}
 
 
-def sol_real(y_linha, y_zero, x_zero):
+def sol_real(y_linha, y_zero, x_zero, cache=True):
     """
     Resolve uma EDO com condição inicial
     :param y_linha: função(dy/dx = função)
     :param y_zero: y inicial
     :param x_zero: x inicial
-    :return: solução da EDO, sendo uma equação simbolica do sympy(Eq())
+    :param cache: se True, reaproveita soluções já calculadas, ver sol_real_em_cache()
+    :return: solução da EDO, sendo uma equação simbolica do sympy(Eq()). Quando o dsolve não encontra uma única
+    solução explícita y = g(x), levanta NotImplementedError
     """
+    if cache:
+        return sol_real_em_cache(y_linha, y_zero, x_zero)[0]
+
+    from sympy import Derivative, Eq, Function, dsolve
+
+    x = _simbolos()[0]
+    f = Function('f')
     ode = Eq(Derivative(f(x), x), y_linha)
-    sol = dsolve(ode, f(x), ics={f(x_zero): y_zero})
+    try:
+        sol = dsolve(ode, f(x), ics={f(x_zero): y_zero})
+    except (NotImplementedError, IndexError, TypeError, ValueError) as erro:
+        #   conforme a EDO, o dsolve desiste com NotImplementedError ou falha com IndexError, TypeError ou ValueError
+        raise NotImplementedError(f"O dsolve não encontrou solução analítica para y' = {y_linha}: {erro!r}") from erro
+
+    if isinstance(sol, list):
+        raise NotImplementedError(f"O dsolve encontrou {len(sol)} soluções para y' = {y_linha}, e não uma só")
+    if sol.lhs != f(x) or sol.rhs.has(f(x)):
+        raise NotImplementedError(f"O dsolve só encontrou uma solução implícita para y' = {y_linha}: {sol}")
     return sol
 
 
-def converte_eq_em_naosimbolico(sol_real_sympy, conjunto_x, y_string=False):
+def sol_real_em_cache(y_linha, y_zero, x_zero):
     """
-    Converte Uma equação simbolica do sympy(Eq()) em um float python
+    Resolve uma EDO com condição inicial usando um cache LRU em memória (TAMANHO_CACHE_SOL_REAL entradas) e um cache
+    em disco (DIRETORIO_CACHE_SOL_REAL, None para desligar), ambos indexados pela forma canônica (srepr) de y_linha,
+    x_zero e y_zero. O disco guarda só a solução serializada (srepr), e o avaliador é compilado de novo por
+    compila_sol_real() ao ler, então uma varredura de h ou num_repet só chama dsolve uma vez por PVI
+    :param y_linha: função(dy/dx = função)
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :return: (solução da EDO como Eq() do sympy, avaliador numérico da solução, ver compila_sol_real())
+    """
+    from sympy import srepr, sympify
+
+    chave = '|'.join(srepr(sympify(termo)) for termo in (y_linha, x_zero, y_zero))
+
+    if chave in _CACHE_SOL_REAL:
+        _CACHE_SOL_REAL.move_to_end(chave)
+        return _CACHE_SOL_REAL[chave]
+
+    arquivo = None
+    if DIRETORIO_CACHE_SOL_REAL is not None:
+        arquivo = os.path.join(DIRETORIO_CACHE_SOL_REAL, hashlib.sha256(chave.encode()).hexdigest() + '.json')
+
+    salvo = None
+    if arquivo is not None and os.path.exists(arquivo):
+        with open(arquivo, encoding='utf-8') as entrada:
+            salvo = json.load(entrada)
+
+    sol = None
+    if salvo is not None and salvo.get('chave') == chave:
+        sol = _le_solucao(salvo['solucao'])
+
+    if sol is None:
+        sol = sol_real(y_linha, y_zero, x_zero, cache=False)
+
+        #   soluções cujo srepr não é lido de volta (ex.: com hyper) ficam só no cache em memória
+        if arquivo is not None and _le_solucao(srepr(sol)) == sol:
+            os.makedirs(DIRETORIO_CACHE_SOL_REAL, exist_ok=True)
+            temporario = f'{arquivo}.{os.getpid()}.tmp'
+            with open(temporario, 'w', encoding='utf-8') as saida:
+                json.dump({'chave': chave, 'solucao': srepr(sol)}, saida)
+            os.replace(temporario, arquivo)
+
+    avaliador = compila_sol_real(sol)
+    _CACHE_SOL_REAL[chave] = (sol, avaliador)
+    if len(_CACHE_SOL_REAL) > TAMANHO_CACHE_SOL_REAL:
+        _CACHE_SOL_REAL.popitem(last=False)
+
+    return sol, avaliador
+
+
+def _le_solucao(texto):
+    from sympy import sympify
+
+    try:
+        return sympify(texto)
+    except (TypeError, ValueError):
+        return None
+
+
+def compila_sol_real(sol_real_sympy):
+    """
+    Compila a solução simbolica do sympy(Eq()) em uma função numpy vetorizada de x. As funções especiais (erf,
+    Bessel, ...) vêm do scipy; expressões que o lambdify não consegue imprimir ou avaliar em arrays são avaliadas
+    ponto a ponto com evalf, como no caminho simbólico
+    :param sol_real_sympy: Equação sympy, como retornada por sol_real()
+    :return: função que recebe um conjunto de x e retorna um array float64 com os valores de y
+    """
+    from sympy import lambdify
+
+    x = _simbolos()[0]
+    expressao = sol_real_sympy.rhs
+    try:
+        funcao = lambdify(x, expressao, ['numpy', 'scipy'])
+    except NotImplementedError:
+        funcao = None
+
+    por_ponto = np.vectorize(lambda x_n: float(expressao.evalf(subs={x: x_n})), otypes=[np.float64])
+
+    def sol(conjunto_x):
+        nonlocal funcao
+        conjunto_x = np.asarray(conjunto_x, dtype=np.float64)
+        valores = None
+        if funcao is not None:
+            try:
+                valores = funcao(conjunto_x)
+            except (TypeError, NameError, AttributeError):
+                #   função sem equivalente vetorizado: as próximas chamadas vão direto para o evalf
+                funcao = None
+        if valores is None:
+            valores = por_ponto(conjunto_x)
+        #   soluções constantes devolvem um escalar, então o resultado é espalhado no formato de conjunto_x
+        return np.broadcast_to(np.asarray(valores, dtype=np.float64), conjunto_x.shape).copy()
+
+    return sol
+
+
+def converte_eq_em_naosimbolico(sol_real_sympy, conjunto_x, y_string=False, avaliador=None):
+    """
+    Converte Uma equação simbolica do sympy(Eq()) em valores float64, avaliando todo o conjunto_x de uma vez
     :param sol_real_sympy: Equação sympy
     :param conjunto_x: Conjunto de x a serem substituidos na função y(x)
     :param y_string: String com a função y(usado para o título dos gráficos e tabelas)
+    :param avaliador: avaliador já compilado da solução (ex.: de sol_real_em_cache()), evita compilar de novo
     :return: caso y_string=False, retorna os valores de y, se não retorna y_string que é uma string da y' usada para
     fins de título nos gráficos e tabelas.
     """
-    aux = str(sol_real_sympy)
-    sol_string = aux[9:len(aux) - 1]
+    if y_string is not False:
+        return sol_real_sympy.rhs
+
+    if avaliador is None:
+        avaliador = compila_sol_real(sol_real_sympy)
+
+    return avaliador(conjunto_x)
+
+
+AnaliseErros = namedtuple('AnaliseErros', ['absoluto', 'relativo', 'log', 'maximo', 'l2', 'rms'])
+
+
+def analisa_erros(valores, exata, piso=None):
+    """
+    Calcula, em uma passagem de arrays sobre todos os métodos, os erros absoluto, relativo e logarítmico de cada
+    ponto e as normas máxima, L2 e RMS dos erros de cada método
+    :param valores: array (métodos x pontos), ou (métodos x pontos x d) para sistemas, com os valores dos métodos
+    :param exata: array (pontos) ou (pontos x d) com a solução exata
+    :param piso: se None, erros nulos (ex.: no ponto inicial) têm ln = nan e ficam fora dos gráficos; se um número,
+    os erros abaixo dele são elevados a ele antes do ln
+    :return: AnaliseErros com absoluto, relativo e log no formato de valores (o relativo é nan onde a solução exata é
+    nula e o erro não) e maximo, l2 e rms com um valor por método
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    exata = np.asarray(exata, dtype=np.float64)
+
+    #   operações com out= para não criar cópias intermediárias do tamanho de valores
+    absoluto = np.subtract(valores, exata)
+    np.abs(absoluto, out=absoluto)
+
+    #   uma linha por método (sem cópia, absoluto é contíguo) para as normas
+    linhas = absoluto.reshape(len(absoluto), -1)
+    maximo = linhas.max(axis=1, initial=0)
+    soma_quadrados = np.einsum('ij,ij->i', linhas, linhas)
+    l2 = np.sqrt(soma_quadrados)
+    rms = np.sqrt(soma_quadrados / max(linhas.shape[1], 1))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relativo = np.divide(absoluto, np.abs(exata))
+        #   0 / 0: o método acertou um ponto em que a solução exata é nula
+        relativo[absoluto == 0] = 0
+        relativo[np.isinf(relativo)] = np.nan
+
+        if piso is None:
+            log = np.log(absoluto)
+            log[absoluto == 0] = np.nan
+        else:
+            log = np.log(np.maximum(absoluto, piso))
+
+    return AnaliseErros(absoluto, relativo, log, maximo, l2, rms)
+
+
+class Resultados:
+    """
+    Resultados dos métodos numéricos em uma grade de x: os valores de todos os métodos ficam em um único bloco float64
+    (métodos x pontos, ou métodos x pontos x d para sistemas), com a linha de cada método contígua e acessada pelo
+    nome, ex.: resultados['euler']
+    :param x: grade de x (conjunto_x)
+    :param valores: dict {nome do método: valores de y na grade}, na ordem em que os métodos serão apresentados
+    :param exata: solução exata na grade, ou None quando o PVI não tem solução analítica
+    :param h: passo da grade
+    :param avaliacoes: dict {nome do método: número de avaliações da EDO}
+    :param tempos: dict {nome do método: tempo de cálculo em segundos}
+    :param adaptativo: [valores de x, valores de y, estatísticas, solução densa] do passo adaptativo, como retornado
+    por dormand_price_adap(), ou None
+    :param instrumentacao: Instrumentacao da execução que gerou os resultados, ou None
+    """
+
+    __slots__ = ('x', 'nomes', 'valores', 'exata', 'h', 'avaliacoes', 'tempos', 'x_adap', 'y_adap',
+                 'estatisticas_adap', 'densa', 'instrumentacao', '_analise')
+
+    def __init__(self, x, valores, exata=None, h=None, avaliacoes=None, tempos=None, adaptativo=None,
+                 instrumentacao=None):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.nomes = tuple(valores)
+        self.valores = np.array([valores[nome] for nome in self.nomes], dtype=np.float64)
+        self.exata = None if exata is None else np.asarray(exata, dtype=np.float64)
+        self.h = h
+        self.avaliacoes = dict(avaliacoes or {})
+        self.tempos = dict(tempos or {})
+        self.x_adap, self.y_adap, self.estatisticas_adap, self.densa = adaptativo or (None, None, None, None)
+        self.instrumentacao = instrumentacao
+        self._analise = None
+
+    def __getitem__(self, nome):
+        return self.valores[self.nomes.index(nome)]
+
+    def __contains__(self, nome):
+        return nome in self.nomes
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def analise(self):
+        """
+        Análise dos erros de todos os métodos em relação à solução exata (calculada uma vez), ver analisa_erros()
+        """
+        if self.exata is None:
+            raise ValueError('Os resultados não têm solução exata para o cálculo dos erros')
+        if self._analise is None:
+            self._analise = analisa_erros(self.valores, self.exata)
+        return self._analise
+
+    @property
+    def erros(self):
+        """
+        Erros absolutos |y_método - y_exata| de todos os métodos, no mesmo formato de valores
+        """
+        return self.analise.absoluto
+
+    def erro(self, nome):
+        """
+        Erro absoluto de um método
+        :param nome: nome do método
+        :return: array com |y_método - y_exata| em cada x
+        """
+        return self.erros[self.nomes.index(nome)]
+
+    def __repr__(self):
+        return f'Resultados(pontos={len(self.x)}, h={self.h}, metodos={list(self.nomes)})'
+
+
+def exporta_resultados(resultados, caminho, formato=None, bloco=65536):
+    """
+    Grava os resultados completos (x, solução exata, valores e erros de cada método) em arquivo, em blocos de linhas
+    e de uma vez por bloco, em vez de linha a linha. Formatos:
+    'csv': texto com uma coluna por série e cabeçalho, com escrita bufferizada (a conversão de cada float em texto
+    domina o tempo, os formatos binários são muito mais rápidos em grades grandes);
+    'npz': arquivo numpy com os arrays de Resultados e os metadados em JSON (chave 'metadados');
+    'memmap': tabela .npy (pontos x colunas) que pode ser aberta com np.load(caminho, mmap_mode='r'), com as colunas e
+    os metadados em caminho + '.json'
+    :param resultados: Resultados
+    :param caminho: arquivo de saída
+    :param formato: 'csv', 'npz' ou 'memmap' (padrão: pela extensão de caminho, .csv, .npz ou .npy)
+    :param bloco: número de linhas gravadas por vez nos formatos em tabela
+    :return: caminho
+    """
+    if formato is None:
+        formato = {'.csv': 'csv', '.npz': 'npz', '.npy': 'memmap'}.get(os.path.splitext(caminho)[1].lower())
+    if formato not in ('csv', 'npz', 'memmap'):
+        raise ValueError(f"formato deve ser 'csv', 'npz' ou 'memmap', recebido: {formato!r} para {caminho!r}")
+
+    colunas, series = _colunas_exportacao(resultados)
+    metadados = {'h': resultados.h, 'metodos': list(resultados.nomes), 'colunas': colunas,
+                 'avaliacoes': resultados.avaliacoes, 'tempos': resultados.tempos,
+                 'estatisticas_adap': resultados.estatisticas_adap}
+
+    if formato == 'npz':
+        arrays = {'x': resultados.x, 'valores': resultados.valores, 'nomes': np.array(resultados.nomes)}
+        if resultados.exata is not None:
+            arrays.update(exata=resultados.exata, erros=resultados.erros)
+        if resultados.x_adap is not None:
+            arrays.update(x_adap=resultados.x_adap, y_adap=resultados.y_adap)
+        np.savez(caminho, metadados=json.dumps(metadados), **arrays)
+
+    elif formato == 'csv':
+        with open(caminho, 'w', buffering=1 << 20, newline='') as arquivo:
+            arquivo.write(','.join(colunas) + '\n')
+            for inicio in range(0, len(resultados.x), bloco):
+                np.savetxt(arquivo, np.column_stack([serie[inicio:inicio + bloco] for serie in series]), fmt='%.17g',
+                           delimiter=',')
+
+    else:
+        tabela = np.lib.format.open_memmap(caminho, mode='w+', dtype=np.float64,
+                                           shape=(len(resultados.x), len(colunas)))
+        for inicio in range(0, len(resultados.x), bloco):
+            tabela[inicio:inicio + bloco] = np.column_stack([serie[inicio:inicio + bloco] for serie in series])
+        tabela.flush()
+        del tabela
+        with open(caminho + '.json', 'w', encoding='utf-8') as arquivo:
+            json.dump(metadados, arquivo)
+
+    return caminho
+
+
+def _colunas_exportacao(resultados):
+    #   nomes e séries (views, sem cópia) das colunas da tabela exportada; sistemas têm uma coluna por componente
+    colunas = ['x']
+    series = [resultados.x]
+
+    def adiciona(nome, valores):
+        if valores.ndim == 1:
+            colunas.append(nome)
+            series.append(valores)
+        else:
+            for j in range(valores.shape[1]):
+                colunas.append(f'{nome}_{j + 1}')
+                series.append(valores[:, j])
+
+    if resultados.exata is not None:
+        adiciona('exata', resultados.exata)
+    for nome, valores in zip(resultados.nomes, resultados.valores):
+        adiciona(nome, valores)
+    if resultados.exata is not None:
+        for nome, erro in zip(resultados.nomes, resultados.erros):
+            adiciona(f'erro_{nome}', erro)
+
+    return colunas, series
+
+
+class Instrumentacao:
+    """
+    Contadores e cronômetros de uma execução: o tempo de cada fase (solução simbólica, compilação, integração,
+    solução exata, exportação, gráficos...), o número de avaliações da EDO e os passos aceitos e rejeitados de cada
+    método. Sem instrumentação (None no lugar deste objeto) as fases usam um contexto vazio e as EDOs não são
+    contadas, então o custo é desprezível
+    :param gancho: função opcional chamada como gancho(fase, 'inicio') e gancho(fase, 'fim') nas bordas de cada fase,
+    ex.: para ligar um cProfile.Profile só na integração
+    """
+
+    def __init__(self, gancho=None):
+        self.gancho = gancho
+        self.fases = {}
+        self.avaliacoes = {}
+        self.aceitos = {}
+        self.rejeitados = {}
+
+    def __getstate__(self):
+        #   o gancho pode não ser serializável, e só faz sentido no processo em que foi criado
+        return {**vars(self), 'gancho': None}
+
+    @contextmanager
+    def fase(self, nome):
+        """
+        Cronometra uma fase, somando o tempo ao de execuções anteriores da mesma fase
+        :param nome: nome da fase
+        """
+        if self.gancho is not None:
+            self.gancho(nome, 'inicio')
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nome] = self.fases.get(nome, 0) + time.perf_counter() - inicio
+            if self.gancho is not None:
+                self.gancho(nome, 'fim')
+
+
+_SEM_INSTRUMENTACAO = nullcontext()
+
+
+def fase(instrumentacao, nome):
+    """
+    Contexto que cronometra uma fase, ver Instrumentacao.fase()
+    :param instrumentacao: Instrumentacao, ou None para não medir nada
+    :param nome: nome da fase
+    :return: gerenciador de contexto
+    """
+    if instrumentacao is None:
+        return _SEM_INSTRUMENTACAO
+    return instrumentacao.fase(nome)
 
-    sol = sympify(sol_string)
 
-    conjunto_y = []
-    for i in range(len(conjunto_x)):
-        conjunto_y.append(round(float(sol.subs(x, conjunto_x[i])), 15))
+def instrumentacao_opcional(instrumenta=False, gancho=None):
+    """
+    :param instrumenta: se True, cria a instrumentação
+    :param gancho: gancho de perfil, ver Instrumentacao (um gancho também liga a instrumentação)
+    :return: Instrumentacao, ou None se ela estiver desligada
+    """
+    if instrumenta or gancho is not None:
+        return Instrumentacao(gancho)
+    return None
 
-    if y_string is False:
-        return conjunto_y
+
+def texto_instrumentacao(instrumentacao, tempos=None):
+    """
+    Resumo em texto da instrumentação de uma execução
+    :param instrumentacao: Instrumentacao
+    :param tempos: dict {nome do método: tempo de cálculo em segundos}, como em Resultados.tempos
+    :return: lista de linhas
+    """
+    tempos = tempos or {}
+    texto = ['------------------------------- INSTRUMENTAÇÃO -------------------------------',
+             '|=================|=============|=============|=============|================|',
+             '|     Método      | Avaliações  |   Aceitos   | Rejeitados  |   Tempo (s)    |',
+             '|=================|=============|=============|=============|================|']
+    for nome, avaliacoes in instrumentacao.avaliacoes.items():
+        texto.append(f'| {nome:<15} | {avaliacoes:>11} | {instrumentacao.aceitos.get(nome, 0):>11} | '
+                     f'{instrumentacao.rejeitados.get(nome, 0):>11} | {tempos.get(nome, 0):>14.6f} |')
+    texto += ['|=================|=============|=============|=============|================|',
+              '',
+              '|=============================|================|',
+              '|            Fase             |   Tempo (s)    |',
+              '|=============================|================|']
+    for nome, tempo in instrumentacao.fases.items():
+        texto.append(f'| {nome:<27} | {tempo:>14.6f} |')
+    texto += ['|=============================|================|',
+              '']
+    return texto
+
+
+def executa_metodos(tarefas, execucao='sequencial', processos=None, cronometra=False):
+    """
+    Executa chamadas independentes de métodos numéricos, em sequência ou em um pool de processos
+    :param tarefas: lista de (função, argumentos)
+    :param execucao: 'sequencial', ou 'processos' para enviar cada tarefa a um pool de processos, de forma que o
+    tempo total fique próximo do da tarefa mais lenta
+    :param processos: número de processos (padrão: número de núcleos)
+    :param cronometra: se True, também retorna o tempo de cada tarefa, medido no processo que a executou
+    :return: lista com o resultado de cada tarefa, na ordem de tarefas (e a lista dos tempos em segundos, se
+    cronometra=True)
+    """
+    if execucao == 'sequencial':
+        cronometrados = [_cronometra(funcao, argumentos) for funcao, argumentos in tarefas]
+    elif execucao == 'processos':
+        cronometrados = [None] * len(tarefas)
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            futuros = {executor.submit(_cronometra, funcao, argumentos): i
+                       for i, (funcao, argumentos) in enumerate(tarefas)}
+            for futuro in as_completed(futuros):
+                cronometrados[futuros[futuro]] = futuro.result()
     else:
-        return sol
+        raise ValueError(f"execucao deve ser 'sequencial' ou 'processos', recebido: {execucao!r}")
+
+    resultados = [resultado for resultado, _ in cronometrados]
+    if cronometra:
+        return resultados, [tempo for _, tempo in cronometrados]
+    return resultados
+
+
+def _cronometra(funcao, argumentos):
+    inicio = time.perf_counter()
+    resultado = funcao(*argumentos)
+    return resultado, time.perf_counter() - inicio
+
+
+def _conta_avaliacoes(funcao, argumentos):
+    #   a EDO (quinto argumento dos métodos) é trocada por uma EdoContada no processo que executa a tarefa
+    edo = EdoContada(argumentos[4])
+    resultado = funcao(*argumentos[:4], edo, *argumentos[5:])
+    return resultado, edo.avaliacoes
 
 
-def calcula_main(y_zero, x_zero, h, num_repet, y_linha, contador):
+def calcula_metodos(y_zero, x_zero, h, num_repet, y_linha, modo='lambdify', execucao='sequencial', exata=None,
+                    instrumentacao=None, implicitos=()):
+    """
+    Calcula o PVI com todos os métodos numéricos (Euler, Euler melhorado, Euler modificado, genéricos de segunda
+    ordem com alfa 1/3 e 1/4, Dormand-Price fixo e adaptativo, e os métodos implícitos pedidos) e junta os valores em
+    um Resultados. O Dormand-Price adaptativo entra na grade pela sua solução densa, e seus pontos próprios ficam em
+    x_adap e y_adap
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo
+    :param num_repet: número de répetições do passo
+    :param y_linha: EDO (ou EdoCompilada)
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :param execucao: 'sequencial' ou 'processos', ver executa_metodos()
+    :param exata: solução exata na grade, ou None
+    :param instrumentacao: Instrumentacao que recebe a fase 'integracao' e as avaliações da EDO e os passos aceitos e
+    rejeitados de cada método, ou None
+    :param implicitos: nomes dos métodos implícitos a serem acrescentados, ver METODOS_IMPLICITOS
+    :return: Resultados com os métodos 'euler', 'euler_mel', 'euler_mod', 'gen_um_terco', 'gen_um_quarto',
+    'dp_fixo' e 'dp_adap', seguidos dos implícitos
+    """
+    for nome in implicitos:
+        if nome not in METODOS_IMPLICITOS:
+            raise ValueError(f'Método implícito desconhecido: {nome!r}, disponíveis: {list(METODOS_IMPLICITOS)}')
+
+    edo = prepara_edo(y_linha, modo)
+    conjunto_x = x_zero + h * np.arange(num_repet + 1)
+
+    pvi = (y_zero, x_zero, h, num_repet, edo)
+    fixos = metodos_passo_fixo(modo)
+    tarefas = [(fixos[nome][0], pvi + fixos[nome][1])
+               for nome in ('euler', 'euler_mel', 'euler_mod', 'gen_um_terco', 'gen_um_quarto', 'dp_fixo')]
+    tarefas.append((dormand_price_adap, pvi + (1e-3, 1e-6, modo, False, True)))
+    tarefas += [(fixos[nome][0], pvi + fixos[nome][1]) for nome in implicitos]
+    nomes = ('euler', 'euler_mel', 'euler_mod', 'gen_um_terco', 'gen_um_quarto', 'dp_fixo', 'dp_adap') + \
+        tuple(implicitos)
+
+    #   as avaliações dos métodos implícitos dependem das iterações de Newton, então são sempre contadas
+    contadas = range(len(tarefas)) if instrumentacao is not None else range(7, len(tarefas))
+    tarefas = [(_conta_avaliacoes, tarefa) if j in contadas else tarefa for j, tarefa in enumerate(tarefas)]
+
+    with fase(instrumentacao, 'integracao'):
+        metodos, tempos = executa_metodos(tarefas, execucao, cronometra=True)
+
+    contagens = {}
+    for j in contadas:
+        metodos[j], contagens[nomes[j]] = metodos[j]
+    adaptativo = metodos[6]
+
+    tabelas = (TABELAS['euler'], TABELAS['euler_mel'], TABELAS['euler_mod'], tabela_seg_ord(1 / 3),
+               tabela_seg_ord(1 / 4))
+    avaliacoes = {nome: len(tabela.c) * num_repet for nome, tabela in zip(nomes, tabelas)}
+    #   o Dormand-Price fixo em passagem única reaproveita o último estágio (FSAL), exceto com uma EDO por passo
+    avaliacoes['dp_fixo'] = 7 * num_repet if edo.por_passo else 1 + 6 * num_repet
+    avaliacoes['dp_adap'] = adaptativo[2]['avaliacoes']
+    avaliacoes.update((nome, contagens[nome]) for nome in implicitos)
+
+    if instrumentacao is not None:
+        instrumentacao.avaliacoes.update(contagens)
+        instrumentacao.aceitos.update(dict.fromkeys(nomes, num_repet), dp_adap=adaptativo[2]['aceitos'])
+        instrumentacao.rejeitados.update(dict.fromkeys(nomes, 0), dp_adap=adaptativo[2]['rejeitados'])
+
+    metodos[6] = adaptativo[3](conjunto_x)
+    return Resultados(conjunto_x, dict(zip(nomes, metodos)), exata, h, avaliacoes, dict(zip(nomes, tempos)),
+                      adaptativo, instrumentacao)
+
+
+def calcula_main(y_zero, x_zero, h, num_repet, y_linha, contador, modo='lambdify', execucao='sequencial', tabela=True,
+                 exporta=None, graficos='arquivo', instrumenta=False, gancho=None, implicitos=()):
     """
     Utiliza o PVI a ser calculado, utilizando os métodos numéricos para solução de EDOs, depois envia as soluções
-    chamando as funções grafico() e print_dados() para respectivamente criar os gráficos e tabelas.
+    chamando as funções grafico(), print_dados() e grafico_erros() para respectivamente criar os gráficos e tabelas.
     :param y_zero: y inicial
     :param x_zero: x inicial
     :param h: passo
     :param num_repet: número de répetições do passo
     :param contador: contador para ser salvo no gráfico
     :param y_linha: EDO
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :param execucao: 'sequencial' ou 'processos', ver executa_metodos()
+    :param tabela: se True, imprime o resumo em tabelas de print_dados()
+    :param exporta: arquivo (.csv, .npz ou .npy) onde gravar os resultados completos, ver exporta_resultados()
+    :param graficos: 'arquivo', 'segundo_plano' ou 'nenhum', ver agenda_grafico()
+    :param instrumenta: se True, mede o tempo de cada fase e conta as avaliações da EDO e os passos de cada método;
+    a medição fica em Resultados.instrumentacao e é mostrada nas tabelas
+    :param gancho: gancho de perfil chamado no início e no fim de cada fase, ver Instrumentacao
+    :param implicitos: nomes dos métodos implícitos calculados junto com os demais, ex.: ('euler_implicito',
+    'trapezio', 'bdf2', 'rosenbrock'), ver METODOS_IMPLICITOS
+    :return: Resultados dos métodos, com a solução exata, ver calcula_metodos()
     """
-    sol_real_sympy = sol_real(y_linha, y_zero, x_zero)
+    from sympy import sympify
+
+    instrumentacao = instrumentacao_opcional(instrumenta, gancho)
 
-    aux = str(y_linha)
-    y_novo = aux.replace("f(x)", "y")
-    y_linha = sympify(y_novo)
+    with fase(instrumentacao, 'sol_real'):
+        sol_real_sympy, avaliador = sol_real_em_cache(y_linha, y_zero, x_zero)
 
-    valores = []
+    with fase(instrumentacao, 'compilacao'):
+        aux = str(y_linha)
+        y_novo = aux.replace("f(x)", "y")
+        y_linha = sympify(y_novo)
+        edo = EdoCompilada(y_linha, modo)
 
-    conjunto_x = []
-    for i in range(num_repet + 1):
-        conjunto_x.append(x_zero + i * h)
+    conjunto_x = x_zero + h * np.arange(num_repet + 1)
 
-    titulo = converte_eq_em_naosimbolico(sol_real_sympy, conjunto_x, True)
+    with fase(instrumentacao, 'exata'):
+        titulo = converte_eq_em_naosimbolico(sol_real_sympy, conjunto_x, True)
+        exata = converte_eq_em_naosimbolico(sol_real_sympy, conjunto_x, avaliador=avaliador)
 
-    #   valores é uma lista de listas contendo [conjunto_x, Euler, Euler_mel, Euler_mod, y_real, 2ord a=1/3, 2ord a=1/4]
-    valores.append(conjunto_x)
-    valores.append(euler(y_zero, x_zero, h, num_repet, y_linha))
-    valores.append(euler_mel(y_zero, x_zero, h, num_repet, y_linha))
-    valores.append(euler_mod(y_zero, x_zero, h, num_repet, y_linha))
-    valores.append(converte_eq_em_naosimbolico(sol_real_sympy, conjunto_x))
-    valores.append(gen_seg_ord_alfa(y_zero, x_zero, h, num_repet, y_linha, 1 / 3))
-    valores.append(gen_seg_ord_alfa(y_zero, x_zero, h, num_repet, y_linha, 1 / 4))
-    valores.append(dormand_price_fixo(y_zero, x_zero, h, num_repet, y_linha))
-    valores.append(dormand_price_adap(y_zero, x_zero, h, num_repet, contador))
+    resultados = calcula_metodos(y_zero, x_zero, h, num_repet, edo, modo, execucao, exata, instrumentacao, implicitos)
 
-    grafico(valores, y_novo, contador)
-    print_dados(valores, titulo, y_linha, contador, y_zero, x_zero, h, num_repet)
+    if exporta is not None:
+        with fase(instrumentacao, 'exportacao'):
+            exporta_resultados(resultados, exporta)
 
+    #   os gráficos vêm antes das tabelas para que o tempo deles já apareça no resumo da instrumentação
+    with fase(instrumentacao, 'graficos'):
+        agenda_grafico(grafico, (resultados, y_novo, contador), graficos)
+        agenda_grafico(grafico_erros, (resultados, contador, titulo), graficos)
+    if tabela:
+        with fase(instrumentacao, 'tabelas'):
+            print_dados(resultados, titulo, y_linha, contador, y_zero, x_zero, h, num_repet)
 
-def grafico(valores, titulo, contador):
+    return resultados
+
+
+def calcula_varios(pvis, processos=None, imprime=True):
     """
-    Faz um gráfico dos métodos numéricos para solução de EDOs e os salva no diretorio
-    :param valores: valores retornados da função "calcula"
-    :param titulo: EDO a ser utilizada
+    Executa calcula_main() para vários PVIs em um pool de processos. As tabelas de cada PVI são capturadas no processo
+    que o calculou e impressas na ordem de pvis, e a falha de um PVI não interrompe os demais
+    :param pvis: lista de dicts com os argumentos de calcula_main(): 'y_linha', 'y_zero', 'x_zero', 'h', 'num_repet' e,
+    opcionalmente, 'contador' (padrão: posição do PVI na lista, começando em 1), 'modo', 'execucao', 'tabela',
+    'exporta', 'graficos', 'instrumenta', 'gancho' e 'implicitos'
+    :param processos: número de processos (padrão: número de núcleos)
+    :param imprime: se True, imprime as tabelas de cada PVI e as falhas conforme ficam prontas
+    :return: lista, na ordem de pvis, de dicts com 'pvi', 'resultados' (None em caso de falha), 'saida' (texto das
+    tabelas) e 'erro' (traceback da falha, ou None)
+    """
+    pvis = [{'contador': i + 1, **pvi} for i, pvi in enumerate(pvis)]
+
+    resultados = []
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = [executor.submit(_executa_pvi, pvi) for pvi in pvis]
+
+        for pvi, futuro in zip(pvis, futuros):
+            try:
+                resultado = futuro.result()
+            except Exception:
+                #   falhas do próprio pool (ex.: processo morto) ou resultados que não puderam ser transferidos
+                resultado = {'resultados': None, 'saida': '', 'erro': traceback.format_exc()}
+            resultado['pvi'] = pvi
+
+            if imprime:
+                print(resultado['saida'], end='')
+                if resultado['erro'] is not None:
+                    print(f"PVI {pvi['contador']} falhou:\n{resultado['erro']}", file=sys.stderr)
+
+            resultados.append(resultado)
+
+    return resultados
+
+
+def _executa_pvi(pvi):
+    saida = io.StringIO()
+    try:
+        with redirect_stdout(saida):
+            resultados = calcula_main(pvi['y_zero'], pvi['x_zero'], pvi['h'], pvi['num_repet'], pvi['y_linha'],
+                                      pvi['contador'], pvi.get('modo', 'lambdify'),
+                                      pvi.get('execucao', 'sequencial'), pvi.get('tabela', True), pvi.get('exporta'),
+                                      pvi.get('graficos', 'arquivo'), pvi.get('instrumenta', False),
+                                      pvi.get('gancho'), pvi.get('implicitos', ()))
+            #   os gráficos em segundo plano deste PVI terminam antes de o processo devolver o resultado, e o processo
+            #   de gráficos é encerrado aqui, pois os processos do pool saem sem os handlers de saída do python
+            aguarda_graficos(encerra=True)
+    except Exception:
+        return {'resultados': None, 'saida': saida.getvalue(), 'erro': traceback.format_exc()}
+
+    return {'resultados': resultados, 'saida': saida.getvalue(), 'erro': None}
+
+
+#   Estudo de convergência: h de cada nível, referência usada ('sol_real' ou 'richardson') e, para cada método, arrays
+#   com o erro máximo, a ordem observada entre níveis vizinhos, as avaliações da EDO e o tempo de cada nível
+#   referencia é a referência usada de fato ('sol_real' ou 'richardson'), e sem_sol_real o motivo de não ter sido a
+#   solução exata (None se ela foi usada ou não foi pedida)
+EstudoConvergencia = namedtuple('EstudoConvergencia', ['h', 'referencia', 'erros', 'ordens', 'avaliacoes', 'tempos',
+                                                       'sem_sol_real'])
+
+METODOS_ESTUDO = ('euler', 'euler_mel', 'euler_mod', 'gen_um_terco', 'gen_um_quarto', 'dp_fixo', 'dp_adap')
+
+
+def metodos_passo_fixo(modo='lambdify'):
+    """
+    Registro dos métodos de passo fixo de calcula_metodos() (os explícitos e os de METODOS_IMPLICITOS)
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :return: dict {nome: (função, argumentos depois da EDO, ordem teórica)}; a função é chamada como
+    funcao(y_zero, x_zero, h, num_repet, edo, *argumentos)
+    """
+    return {'euler': (euler, (), TABELAS['euler'].ordem),
+            'euler_mel': (euler_mel, (), TABELAS['euler_mel'].ordem),
+            'euler_mod': (euler_mod, (), TABELAS['euler_mod'].ordem),
+            'gen_um_terco': (gen_seg_ord_alfa, (1 / 3,), 2),
+            'gen_um_quarto': (gen_seg_ord_alfa, (1 / 4,), 2),
+            'dp_fixo': (dormand_price_fixo, (modo, True), TABELAS['dormand_prince'].ordem),
+            'euler_implicito': (euler_implicito, (modo,), 1),
+            'trapezio': (trapezio, (modo,), 2),
+            'bdf2': (bdf2, (modo,), 2),
+            'rosenbrock': (rosenbrock, (modo,), 2)}
+
+
+def estudo_convergencia(y_zero, x_zero, h, num_repet, y_linha, refinamentos=6, metodos=METODOS_ESTUDO, referencia=None,
+                        modo='lambdify', execucao='processos', processos=None, graficos='nenhum', contador=1):
+    """
+    Calcula o PVI com cada método nos passos h, h/2, h/4, ... (todos os cálculos em paralelo) e mede, na grade do
+    passo h, o erro máximo de cada nível, a ordem observada log2(erro(h) / erro(h/2)) entre níveis vizinhos e o custo
+    de cada cálculo (avaliações da EDO e tempo), que são os dados de trabalho-precisão. O Dormand-Price adaptativo
+    entra com as tolerâncias (1e-3 e 1e-6) divididas por 10 a cada nível e não tem ordem observada (nan). Erros que
+    chegam ao arredondamento do float64 dão ordens sem sentido nos níveis mais finos
+    :param y_zero: y inicial
+    :param x_zero: x inicial
+    :param h: passo mais grosso
+    :param num_repet: número de répetições do passo mais grosso
+    :param y_linha: EDO em f(x), como em calcula_main(); uma EDO em y, EdoCompilada ou função python só pode ser
+    comparada com a extrapolação de Richardson
+    :param refinamentos: número de níveis (pelo menos 2)
+    :param metodos: nomes dos métodos, ver METODOS_ESTUDO; os de METODOS_IMPLICITOS também podem ser estudados
+    :param referencia: 'sol_real' para comparar com a solução exata, 'richardson' para comparar com a extrapolação de
+    Richardson dos dois níveis mais finos do método de maior ordem, ou None para usar a solução exata quando o sympy
+    a encontra e Richardson caso contrário
+    :param modo: 'lambdify' ou 'subs' (referência simbólica), ver EdoCompilada
+    :param execucao: 'processos' ou 'sequencial', ver executa_metodos(); com processos, uma EDO dada como função
+    python precisa ser serializável (definida no nível do módulo, não um lambda)
+    :param processos: número de processos (padrão: número de núcleos)
+    :param graficos: 'arquivo', 'segundo_plano' ou 'nenhum' para os gráficos de trabalho-precisão, ver
+    grafico_convergencia() e agenda_grafico()
     :param contador: contador para ser salvo no nome do gráfico
+    :return: EstudoConvergencia
     """
-    plt.style.use('seaborn')
+    if refinamentos < 2:
+        raise ValueError(f'refinamentos deve ser pelo menos 2, recebido: {refinamentos}')
+    if referencia not in (None, 'sol_real', 'richardson'):
+        raise ValueError(f"referencia deve ser 'sol_real', 'richardson' ou None, recebido: {referencia!r}")
+
+    em_f = _e_simbolico(y_linha) and not getattr(y_linha, 'is_Matrix', False) and 'f(x)' in str(y_linha)
+    if referencia == 'sol_real' and not em_f:
+        raise ValueError("referencia='sol_real' precisa de uma EDO escalar simbólica em f(x)")
+
+    exata = None
+    sem_sol_real = None
+    conjunto_x = x_zero + h * np.arange(num_repet + 1)
+    if em_f and referencia != 'richardson':
+        try:
+            sol_real_sympy, avaliador = sol_real_em_cache(y_linha, y_zero, x_zero)
+        except NotImplementedError as erro:
+            #   sem solução analítica explícita, ver sol_real()
+            if referencia == 'sol_real':
+                raise
+            sem_sol_real = str(erro)
+        else:
+            exata = converte_eq_em_naosimbolico(sol_real_sympy, conjunto_x, avaliador=avaliador)
+    elif referencia is None:
+        sem_sol_real = 'A EDO não é uma EDO escalar simbólica em f(x)'
+    if em_f:
+        from sympy import sympify
+
+        y_linha = sympify(str(y_linha).replace('f(x)', 'y'))
+    edo = prepara_edo(y_linha, modo)
+
+    metodos_fixos = metodos_passo_fixo(modo)
+    fatores = (2 ** np.arange(refinamentos)).tolist()
+    tarefas = []
+    for nome in metodos:
+        for nivel, fator in enumerate(fatores):
+            pvi = (y_zero, x_zero, h / fator, num_repet * fator, edo)
+            if nome == 'dp_adap':
+                tarefa = (dormand_price_adap, pvi + (1e-3 / 10 ** nivel, 1e-6 / 10 ** nivel, modo, False, True))
+            else:
+                funcao, argumentos, _ = metodos_fixos[nome]
+                tarefa = (funcao, pvi + argumentos)
+            tarefas.append((_conta_avaliacoes, tarefa))
+
+    calculados, tempos = executa_metodos(tarefas, execucao, processos, cronometra=True)
+
+    #   valores de cada método e nível na grade do passo h (métodos x níveis x pontos)
+    valores = {}
+    for m, nome in enumerate(metodos):
+        niveis = calculados[m * refinamentos:(m + 1) * refinamentos]
+        if nome == 'dp_adap':
+            valores[nome] = np.array([adaptativo[3](conjunto_x) for adaptativo, _ in niveis])
+        else:
+            valores[nome] = np.array([calculado[::fator] for (calculado, _), fator in zip(niveis, fatores)])
+
+    if exata is None:
+        fixos = [nome for nome in metodos if nome in metodos_fixos]
+        if not fixos:
+            raise ValueError('A extrapolação de Richardson precisa de ao menos um método de passo fixo')
+        #   y(h/2) + (y(h/2) - y(h)) / (2^p - 1) elimina o termo de ordem p do erro do método mais preciso
+        maior = max(fixos, key=lambda nome: metodos_fixos[nome][2])
+        grosso, fino = valores[maior][-2:]
+        exata = fino + (fino - grosso) / (2 ** metodos_fixos[maior][2] - 1)
+        referencia = 'richardson'
+    else:
+        referencia = 'sol_real'
+
+    erros, ordens, avaliacoes, tempos_metodos = {}, {}, {}, {}
+    for m, nome in enumerate(metodos):
+        erros[nome] = analisa_erros(valores[nome], exata).maximo
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ordens[nome] = np.log2(erros[nome][:-1] / erros[nome][1:])
+        if nome == 'dp_adap':
+            ordens[nome][:] = np.nan
+        niveis = slice(m * refinamentos, (m + 1) * refinamentos)
+        avaliacoes[nome] = np.array([contagem for _, contagem in calculados[niveis]])
+        tempos_metodos[nome] = np.array(tempos[niveis])
 
-    plot_edos, edos = plt.subplots()
+    estudo = EstudoConvergencia(h / np.array(fatores, dtype=np.float64), referencia, erros, ordens, avaliacoes,
+                                tempos_metodos, sem_sol_real)
+    agenda_grafico(grafico_convergencia, [estudo, contador], graficos)
 
-    edos.plot(valores[0], valores[4], label='Função real', linewidth=4, alpha=1, color='black')
-    edos.plot(valores[0], valores[1], label='Euler', linestyle=':', linewidth=3, color='#FE4A49', alpha=0.9)
-    edos.plot(valores[0], valores[2], label='Euler melhorado', linestyle=':', linewidth=3, color='#2AB7CA', alpha=0.8)
-    edos.plot(valores[0], valores[3], label='Euler modficado', linestyle=':', linewidth=3, color='#FEC620', alpha=0.7)
-    edos.plot(valores[0], valores[5], label='Genérico de segunda ordem com alfa = 1/3', linewidth=3, alpha=0.6,
-              linestyle=':', color='#1A5274')
-    edos.plot(valores[0], valores[6], label='Genérico de segunda ordem com alfa = 1/4', linewidth=3, alpha=0.5,
-              linestyle=':', color='#B892FF')
-    edos.plot(valores[0], valores[7], label='Dormand Price com passo fixo', alpha=0.4, linewidth=3,
-              linestyle=':', color='#BAFF29')
-    edos.plot(valores[8][0], valores[8][1], label='Dormand Price com passo adaptativo', alpha=0.3, linewidth=3,
-              linestyle=':')
+    return estudo
+
+
+def print_convergencia(estudo):
+    """
+    Imprime o estudo de convergência em uma tabela por método, com o erro, a ordem observada e o custo de cada passo
+    :param estudo: EstudoConvergencia, ver estudo_convergencia()
+    """
+    texto = ['',
+             f'############################ Estudo de convergência ({estudo.referencia}) ############################',
+             '']
+    if estudo.sem_sol_real is not None:
+        texto += [f'Referência: extrapolação de Richardson, sem a solução exata ({estudo.sem_sol_real})', '']
+    for nome, erros in estudo.erros.items():
+        ordens = [''] + [f'{ordem:.4f}' for ordem in estudo.ordens[nome].tolist()]
+        texto += [f'       Método: {nome}',
+                  '|====================|=======================|============|=============|================|',
+                  '|         h          |      Erro máximo      |   Ordem    | Avaliações  |   Tempo (s)    |',
+                  '|====================|=======================|============|=============|================|']
+        for passo, erro, ordem, avaliacoes, tempo in zip(estudo.h.tolist(), erros.tolist(), ordens,
+                                                         estudo.avaliacoes[nome].tolist(),
+                                                         estudo.tempos[nome].tolist()):
+            texto.append(f'| {passo:<18.12g} | {erro:>21.15e} | {ordem:>10} | {avaliacoes:>11} | {tempo:>14.6f} |')
+        texto += ['|====================|=======================|============|=============|================|',
+                  '']
+
+    print('\n'.join(texto))
+
+
+def agenda_grafico(funcao, argumentos, graficos='arquivo'):
+    """
+    Executa uma função de gráfico conforme o modo escolhido. Os gráficos só são salvos em arquivo, nunca exibidos:
+    são desenhados em figuras do matplotlib criadas sem o pyplot (ver com_estilo()), então o backend do processo que
+    chamou não muda; só o processo de segundo plano usa o backend Agg
+    :param funcao: função de gráfico (ex.: grafico, grafico_erros, influx.graficos_influx)
+    :param argumentos: argumentos da função, que no modo 'segundo_plano' são enviados a outro processo
+    :param graficos: 'arquivo' para desenhar e salvar agora, 'segundo_plano' para desenhar em um processo separado
+    enquanto os cálculos continuam (ver aguarda_graficos()), ou 'nenhum' para não desenhar
+    :return: Future do gráfico no modo 'segundo_plano', se não None
+    """
+    if graficos == 'nenhum':
+        return None
+    if graficos == 'arquivo':
+        funcao(*argumentos)
+        return None
+    if graficos != 'segundo_plano':
+        raise ValueError(f"graficos deve ser 'arquivo', 'segundo_plano' ou 'nenhum', recebido: {graficos!r}")
+
+    global _EXECUTOR_GRAFICOS
+    #   um processo criado por fork (ex.: em calcula_varios()) herda o executor do pai, que não funciona nele
+    if _EXECUTOR_GRAFICOS is None or _EXECUTOR_GRAFICOS[0] != os.getpid():
+        #   um único processo: os gráficos saem na ordem em que foram agendados
+        _EXECUTOR_GRAFICOS = (os.getpid(), ProcessPoolExecutor(max_workers=1, initializer=_sem_janela))
+        del _GRAFICOS_PENDENTES[:]
+    futuro = _EXECUTOR_GRAFICOS[1].submit(funcao, *argumentos)
+    _GRAFICOS_PENDENTES.append(futuro)
+    return futuro
+
+
+def aguarda_graficos(encerra=False):
+    """
+    Espera os gráficos agendados em segundo plano ficarem prontos
+    :param encerra: se True, também encerra o processo de gráficos (um novo é criado se outro gráfico for agendado)
+    :return: número de gráficos concluídos; a primeira falha de um gráfico é relançada
+    """
+    global _EXECUTOR_GRAFICOS
+    pendentes = _GRAFICOS_PENDENTES[:]
+    del _GRAFICOS_PENDENTES[:]
+    try:
+        for futuro in pendentes:
+            futuro.result()
+    finally:
+        if encerra and _EXECUTOR_GRAFICOS is not None and _EXECUTOR_GRAFICOS[0] == os.getpid():
+            _EXECUTOR_GRAFICOS[1].shutdown()
+            _EXECUTOR_GRAFICOS = None
+    return len(pendentes)
+
+
+def _sem_janela():
+    #   antes de importar o pyplot, para que nenhum backend com janela seja carregado
+    import matplotlib
+
+    matplotlib.use('Agg')
+
+
+def estilo_graficos():
+    """
+    :return: nome do estilo seaborn do matplotlib, que nas versões novas se chama 'seaborn-v0_8'
+    """
+    from matplotlib import style
+
+    return 'seaborn' if 'seaborn' in style.available else 'seaborn-v0_8'
+
+
+def com_estilo(funcao):
+    """
+    Decorador das funções de gráfico: desenha no estilo de estilo_graficos() só durante a chamada, sem mudar o estilo
+    nem o backend globais do matplotlib de quem chamou. As funções de gráfico criam as figuras com
+    matplotlib.figure.Figure, e não pelo pyplot, então nenhuma janela é aberta
+    :param funcao: função de gráfico
+    :return: função de gráfico com o estilo
+    """
+    @wraps(funcao)
+    def desenha(*argumentos, **opcoes):
+        from matplotlib import style
+
+        with style.context(estilo_graficos()):
+            return funcao(*argumentos, **opcoes)
+
+    return desenha
+
+
+def reduz_pontos(x, y, max_pontos=None):
+    """
+    Reduz uma série longa à resolução do gráfico: divide os pontos em faixas consecutivas e mantém o menor e o maior y
+    de cada uma (além do primeiro e do último ponto), assim picos e oscilações continuam visíveis
+    :param x: valores de x
+    :param y: valores de y (nan é permitido e continua fora do gráfico)
+    :param max_pontos: número máximo aproximado de pontos (padrão: MAX_PONTOS_GRAFICO)
+    :return: (x, y) reduzidos, ou os próprios x e y se já forem curtos
+    """
+    max_pontos = MAX_PONTOS_GRAFICO if max_pontos is None else max_pontos
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= max_pontos:
+        return x, y
+
+    largura = -(-n // max(max_pontos // 2, 1))
+    faixas = -(-n // largura)
+    preenchido = np.full(faixas * largura, np.nan)
+    preenchido[:n] = y
+    preenchido = preenchido.reshape(faixas, largura)
+    #   nan (dos dados ou do preenchimento) não conta nos extremos; uma faixa só de nan fica com o seu primeiro ponto,
+    #   para que a falha continue visível como uma quebra da linha
+    so_nan = np.isnan(preenchido).all(axis=1)
+    inicio = np.arange(faixas) * largura
+    com_valores = preenchido[~so_nan]
+    menores = inicio[~so_nan] + np.nanargmin(com_valores, axis=1)
+    maiores = inicio[~so_nan] + np.nanargmax(com_valores, axis=1)
+    indices = np.unique(np.concatenate(([0, n - 1], menores, maiores, inicio[so_nan])))
+
+    return x[indices], y[indices]
+
+
+_ROTULOS_METODOS = {
+    'euler': ('Euler', 'o', '#FE4A49'),
+    'euler_mel': ('Euler melhorado', 'v', '#2AB7CA'),
+    'euler_mod': ('Euler modificado', '^', '#FEC620'),
+    'gen_um_terco': ('Genérico de segunda ordem com alfa = 1/3', 's', '#1A5274'),
+    'gen_um_quarto': ('Genérico de segunda ordem com alfa = 1/4', '*', '#B892FF'),
+    'dp_fixo': ('Dormand Price com passo fixo', '>', '#BAFF29'),
+    'dp_adap': ('Dormand Price com passo adaptativo', '<', 'black'),
+    'euler_implicito': ('Euler implícito', 'D', '#8C5E58'),
+    'trapezio': ('Trapézio implícito', 'P', '#4C956C'),
+    'bdf2': ('BDF2', 'X', '#F28482'),
+    'rosenbrock': ('Rosenbrock ROS2', 'h', '#6D597A'),
+}
+
+
+@com_estilo
+def grafico(resultados, titulo, contador):
+    """
+    Faz um gráfico dos métodos numéricos para solução de EDOs e os salva no diretorio
+    :param resultados: Resultados retornados da função "calcula_main"
+    :param titulo: EDO a ser utilizada
+    :param contador: contador para ser salvo no nome do gráfico
+    """
+    from matplotlib.figure import Figure
+
+    plot_edos = Figure()
+    edos = plot_edos.subplots()
+
+    conjunto_x = resultados.x
+    edos.plot(*reduz_pontos(conjunto_x, resultados.exata), label='Função real', linewidth=4, alpha=1, color='black')
+    edos.plot(*reduz_pontos(conjunto_x, resultados['euler']), label='Euler', linestyle=':', linewidth=3,
+              color='#FE4A49', alpha=0.9)
+    edos.plot(*reduz_pontos(conjunto_x, resultados['euler_mel']), label='Euler melhorado', linestyle=':', linewidth=3,
+              color='#2AB7CA', alpha=0.8)
+    edos.plot(*reduz_pontos(conjunto_x, resultados['euler_mod']), label='Euler modficado', linestyle=':', linewidth=3,
+              color='#FEC620', alpha=0.7)
+    edos.plot(*reduz_pontos(conjunto_x, resultados['gen_um_terco']), label='Genérico de segunda ordem com alfa = 1/3',
+              linewidth=3, alpha=0.6, linestyle=':', color='#1A5274')
+    edos.plot(*reduz_pontos(conjunto_x, resultados['gen_um_quarto']), label='Genérico de segunda ordem com alfa = 1/4',
+              linewidth=3, alpha=0.5, linestyle=':', color='#B892FF')
+    edos.plot(*reduz_pontos(conjunto_x, resultados['dp_fixo']), label='Dormand Price com passo fixo', alpha=0.4,
+              linewidth=3, linestyle=':', color='#BAFF29')
+    edos.plot(*reduz_pontos(resultados.x_adap, resultados.y_adap), label='Dormand Price com passo adaptativo',
+              alpha=0.3, linewidth=3, linestyle=':')
+    for nome in resultados.nomes[7:]:
+        rotulo, _, cor = _ROTULOS_METODOS[nome]
+        edos.plot(*reduz_pontos(conjunto_x, resultados[nome]), label=rotulo, linestyle='--', linewidth=3, color=cor,
+                  alpha=0.6)
 
     edos.legend(fontsize='medium')
     edos.set_title(f"Métodos numéricos para solução gráfica da seguinte EDO: y' = {titulo}")
 
-    plt.savefig(f'Métodos numéricos para solução gráfica {contador}')
+    plot_edos.savefig(f'Métodos numéricos para solução gráfica {contador}')
+
 
+#   cabeçalhos das tabelas de print_dados(); o segundo elemento é a borda, repetida no fim da tabela
+_CABECALHO_RESULTADOS = [
+    '------------------------------------------- TABELA DE RESULTADOS -------------------------------------------',
+    '|=======|===========|===========|===========|===========|============|============|============|============|',
+    '|   X   |  S.Exata  |   Euler   |  E. Mel.  |  E. Mod.  | 2ord a=1/3 | 2ord a=1/4 | ODE45 fixo | ODE45 adap |',
+    '|=======|===========|===========|===========|===========|============|============|============|============|',
+]
+_CABECALHO_ERROS = [
+    '----------------------------------------------- TABELA DE ERROS -----------------------------------------------',
+    '|=======|===========|===========|===========|============|============|====================|====================|',
+    '|   X   |   Euler   |  E. Mel.  |  E. Mod.  | 2ord a=1/3 | 2ord a=1/4 |      ODE45 fixo    |      ODE45 adap    |',
+    '|=======|===========|===========|===========|============|============|====================|====================|',
+]
 
-def print_dados(valores, titulo, y_linha, contador, y_zero, x_zero, h, num_repet):
+
+def amostra_linhas(total, linhas):
+    """
+    Escolhe as linhas de um resumo em tabela: todas, se couberem, ou linhas espaçadas uniformemente, sempre com a
+    primeira e a última
+    :param total: número de linhas disponíveis
+    :param linhas: número máximo de linhas do resumo (None para todas)
+    :return: array com os índices das linhas escolhidas, em ordem
     """
-    Imprime os valores calculados e seus respectivos erros em tabelas, estes erros são enviados para função
-    grafico_erros() para que os erros dos métodos numéricos sejam plotados
-    :param valores: valores retornados da função "calcula"
+    if linhas is None or total <= linhas:
+        return np.arange(total)
+    return np.unique(np.linspace(0, total - 1, max(linhas, 2)).round().astype(np.int64))
+
+
+def print_dados(resultados, titulo, y_linha, contador, y_zero, x_zero, h, num_repet, linhas=LINHAS_TABELA):
+    """
+    Imprime um resumo dos valores calculados e de seus respectivos erros em tabelas, e da instrumentação, se houver.
+    Em grades grandes só uma amostra das linhas é impressa; os resultados completos são gravados por
+    exporta_resultados()
+    :param resultados: Resultados retornados da função "calcula_main"
     :param titulo: String com a função y(usado para o título dos gráficos e tabelas)
     :param y_linha: y' simbolico
     :param contador: contador
@@ -413,119 +2211,169 @@ def print_dados(valores, titulo, y_linha, contador, y_zero, x_zero, h, num_repet
     :param x_zero: x inicial
     :param h: passo
     :param num_repet: número de repetições do passo
+    :param linhas: número máximo de linhas das tabelas de resultados e de erros (None para todas), ver
+    amostra_linhas()
     """
-    print('')
-    print(f'#################################### Problema 1 - {contador} #########################################')
-    print('')
-    print(f'       EDO: dy/dx = {y_linha}')
-    print('')
-    print(f"       Cond. Iniciais: y0 = {y_zero}   x0 = {x_zero}   h = {h}")
-    print('')
-    print(f"       S. Exata:  y(x) = {titulo}")
-    print('')
-    print('------------------------------------- TABELA DE RESULTADOS -------------------------------------')
-    print('|=======|===========|===========|===========|===========|============|============|============|')
-    print('|   X   |  S.Exata  |   Euler   |  E. Mel.  |  E. Mod.  | 2ord a=1/3 | 2ord a=1/4 | ODE45 fixo |')
-    print('|=======|===========|===========|===========|===========|============|============|============|')
-
-    for i in range(num_repet + 1):
-
-        if (valores[4][i] and valores[1][i] and valores[2][i] and valores[3][i] and valores[6][i]) < 10:
-
-            print(f'| {valores[0][i]:.3f} | {valores[4][i]:.7f} | {valores[1][i]:.7f} | {valores[2][i]:.7f} | '
-                  f'{valores[3][i]:.7f} | {valores[5][i]:.7f}  | {valores[6][i]:.7f}  | {valores[7][i]:.7f}  |')
+    indices = amostra_linhas(num_repet + 1, linhas)
+
+    #   linhas em floats python: formatar elementos numpy um a um é mais lento
+    conjunto_x = resultados.x[indices].tolist()
+    exata = resultados.exata[indices].tolist()
+    euler, euler_mel, euler_mod, gen_a1, gen_a2, dp_fixo, dp_adap = resultados.valores[:7, indices].tolist()
+    erro_euler, erro_euler_mel, erro_euler_mod, erro_gen_a1, erro_gen_a2, erro_dp_fixo, erro_dp_adap = \
+        resultados.erros[:7, indices].tolist()
+
+    #   o texto é montado inteiro e impresso de uma vez
+    texto = ['',
+             f'#################################### Problema 1 - {contador} #########################################',
+             '',
+             f'       EDO: dy/dx = {y_linha}',
+             '',
+             f"       Cond. Iniciais: y0 = {y_zero}   x0 = {x_zero}   h = {h}",
+             '',
+             f"       S. Exata:  y(x) = {titulo}",
+             '']
+    if len(indices) < num_repet + 1:
+        texto += [f'       Amostra de {len(indices)} das {num_repet + 1} linhas, ver exporta_resultados()', '']
+
+    texto += _CABECALHO_RESULTADOS
+
+    for i in range(len(indices)):
+
+        if (exata[i] and euler[i] and euler_mel[i] and euler_mod[i] and gen_a2[i]) < 10:
+
+            texto.append(f'| {conjunto_x[i]:.3f} | {exata[i]:.7f} | {euler[i]:.7f} | {euler_mel[i]:.7f} | '
+                         f'{euler_mod[i]:.7f} | {gen_a1[i]:.7f}  | {gen_a2[i]:.7f}  | {dp_fixo[i]:.7f}  | '
+                         f'{dp_adap[i]:.7f}  |')
         else:
 
-            print(f'| {valores[0]:.3f} | {valores[4][i]:.6f} | {valores[1][i]:.6f} | {valores[2][i]:.6f} | '
-                  f'{valores[3][i]:.6f} | {valores[5][i]:.6f}  | {valores[6][i]:.6f}  | {valores[7][i]:.6f}  |')
-
-    print('|=======|===========|===========|===========|===========|============|============|============|')
-    print('')
-    print('')
-    print('------------------------------------- TABELA DE ERROS --------------------------------------')
-    print('|=======|===========|===========|===========|============|============|====================|')
-    print('|   X   |   Euler   |  E. Mel.  |  E. Mod.  | 2ord a=1/3 | 2ord a=1/4 |      ODE45 fixo    |')
-    print('|=======|===========|===========|===========|============|============|====================|')
-
-    #   erros é uma lista de listas contendo [erro_euler, erro_euler_mel, erro_euler_mod, erro_gen_a1, erro_gen_a2]
-    erro_euler = []
-    erro_euler_mel = []
-    erro_euler_mod = []
-    erro_gen_a1 = []
-    erro_gen_a2 = []
-    erro_dp_fixo = []
-    for i in range(num_repet + 1):
-
-        erro_euler.append(abs(valores[1][i] - valores[4][i]))
-        erro_euler_mel.append(abs(valores[2][i] - valores[4][i]))
-        erro_euler_mod.append(abs(valores[3][i] - valores[4][i]))
-        erro_gen_a1.append(abs(valores[5][i] - valores[4][i]))
-        erro_gen_a2.append(abs(valores[6][i] - valores[4][i]))
-        erro_dp_fixo.append(abs(valores[7][i] - valores[4][i]))
+            texto.append(f'| {conjunto_x[i]:.3f} | {exata[i]:.6f} | {euler[i]:.6f} | {euler_mel[i]:.6f} | '
+                         f'{euler_mod[i]:.6f} | {gen_a1[i]:.6f}  | {gen_a2[i]:.6f}  | {dp_fixo[i]:.6f}  | '
+                         f'{dp_adap[i]:.6f}  |')
+
+    texto += [_CABECALHO_RESULTADOS[1], '', '']
+    texto += _CABECALHO_ERROS
+
+    for i in range(len(indices)):
 
         if (erro_euler[i] and erro_euler_mel[i] and erro_euler_mod[i] and erro_gen_a1[i] and erro_gen_a2[i]) < 10:
 
-            print(f'| {valores[0][i]:.3f} | {erro_euler[i]:.7f} | {erro_euler_mel[i]:.7f} | '
-                  f'{erro_euler_mod[i]:.7f} | {erro_gen_a1[i]:.7f}  | {erro_gen_a2[i]:.7f}  | {erro_dp_fixo[i]:.15f}  |')
+            texto.append(f'| {conjunto_x[i]:.3f} | {erro_euler[i]:.7f} | {erro_euler_mel[i]:.7f} | '
+                         f'{erro_euler_mod[i]:.7f} | {erro_gen_a1[i]:.7f}  | {erro_gen_a2[i]:.7f}  | '
+                         f'{erro_dp_fixo[i]:.15f}  | {erro_dp_adap[i]:.15f}  |')
         else:
 
-            print(f'| {valores[0][i]:.3f} | {erro_euler[i]:.6f} | {erro_euler_mel[i]:.6f} | '
-                  f'{erro_euler_mod[i]:.6f} | {erro_gen_a1[i]:.6f}  | {erro_gen_a2[i]:.6f}  | {erro_dp_fixo[i]:.15f}  |')
+            texto.append(f'| {conjunto_x[i]:.3f} | {erro_euler[i]:.6f} | {erro_euler_mel[i]:.6f} | '
+                         f'{erro_euler_mod[i]:.6f} | {erro_gen_a1[i]:.6f}  | {erro_gen_a2[i]:.6f}  | '
+                         f'{erro_dp_fixo[i]:.15f}  | {erro_dp_adap[i]:.15f}  |')
+
+    texto += [_CABECALHO_ERROS[1], '']
+
+    if len(resultados.nomes) > 7:
+        texto += _tabela_implicitos(resultados, indices, conjunto_x)
 
-    print('|=======|===========|===========|===========|============|============|====================|')
-    print('')
+    analise = resultados.analise
+    texto += ['-------------------------------- NORMAS DOS ERROS -------------------------------',
+              '|=================|===================|===================|===================|',
+              '|     Método      |      Máximo       |        L2         |        RMS        |',
+              '|=================|===================|===================|===================|']
+    for nome, maximo, l2, rms in zip(resultados.nomes, analise.maximo.tolist(), analise.l2.tolist(),
+                                     analise.rms.tolist()):
+        texto.append(f'| {nome:<15} | {maximo:.15f} | {l2:.15f} | {rms:.15f} |')
+    texto += ['|=================|===================|===================|===================|',
+              '']
 
-    # erros é uma lista de listas contendo [erro_euler, erro_euler_mel, erro_euler_mod, erro_gen_a1, erro_gen_a2,
-    # erro_dp_fixo]
-    erros = [erro_euler, erro_euler_mel, erro_euler_mod, erro_gen_a1, erro_gen_a2, erro_dp_fixo]
-    grafico_erros(erros, valores[0], contador, titulo)
+    if resultados.instrumentacao is not None:
+        texto += texto_instrumentacao(resultados.instrumentacao, resultados.tempos)
 
+    print('\n'.join(texto))
 
-def grafico_erros(erros, conjunto_x, contador, titulo):
+
+def _tabela_implicitos(resultados, indices, conjunto_x):
+    #   valores e erros dos métodos implícitos, com uma coluna de cada por método
+    nomes = resultados.nomes[7:]
+    valores = resultados.valores[7:, indices].tolist()
+    erros = resultados.erros[7:, indices].tolist()
+
+    borda = '|=======|' + '=======================|=======================|' * len(nomes)
+    texto = [' TABELA DOS MÉTODOS IMPLÍCITOS '.center(len(borda), '-'),
+             borda,
+             '|   X   |' + ''.join(f' {nome:^21} | {"erro " + nome:^21} |' for nome in nomes),
+             borda]
+    for i in range(len(indices)):
+        texto.append(f'| {conjunto_x[i]:.3f} |' + ''.join(f' {valores[m][i]:>21.12g} | {erros[m][i]:>21.15f} |'
+                                                          for m in range(len(nomes))))
+    texto += [borda, '']
+    return texto
+
+
+@com_estilo
+def grafico_erros(resultados, contador, titulo):
     """
     Faz um gráfico dos erros dos métodos numéricos para solução de EDOs com relação aos valores da solução análitica
     da EDO
-    :param erros: conjunto de erros de cada método numérico com relação aos valores da solução análitica da EDO
-    :param conjunto_x: conjunto de x dos erros
+    :param resultados: Resultados com a solução exata, ver Resultados.analise
     :param contador: contador
     :param titulo: EDO a ser utilizada
     """
-    aux_euler = []
-    aux_euler_mel = []
-    aux_euler_mod = []
-    aux_2gen_umterco = []
-    aux_2gen_umquarto = []
-    aux_dp_fixo = []
-    for i in range(len(erros[0])):
-        if (erros[0][i] or erros[1][i] or erros[2][i] or erros[3][i] or erros[4][i]) == 0:
-            i += 1
-
-        aux_euler.append(round(ln(erros[0][i]), 15))
-        aux_euler_mel.append(round(ln(erros[1][i]), 15))
-        aux_euler_mod.append(round(ln(erros[2][i]), 15))
-        aux_2gen_umterco.append(round(ln(erros[3][i]), 15))
-        aux_2gen_umquarto.append(round(ln(erros[4][i]), 15))
-        aux_dp_fixo.append(round(ln(erros[5][i]), 15))
-
-    #   erros_ln é uma lista de listas contendo os ln dos valores da lista de listas erros
-    erros_ln = [aux_euler, aux_euler_mel, aux_euler_mod, aux_2gen_umterco, aux_2gen_umquarto, aux_dp_fixo]
-
-    plt.style.use('seaborn')
-
-    plot_edos, edos_erros = plt.subplots()
-
-    edos_erros.plot(conjunto_x, erros_ln[0], label='Erro Euler', linewidth=2, marker='o', color='#FE4A49')
-    edos_erros.plot(conjunto_x, erros_ln[1], label='Erro Euler melhorado', linewidth=2, marker='v', color='#2AB7CA')
-    edos_erros.plot(conjunto_x, erros_ln[2], label='Erro Euler modificado', linewidth=2, marker='^', color='#FEC620')
-    edos_erros.plot(conjunto_x, erros_ln[3], label='Erro Genérico de segunda ordem com alfa = 1/3', linewidth=2,
-                    marker='s', color='#1A5274')
-    edos_erros.plot(conjunto_x, erros_ln[4], label='Erro Genérico de segunda ordem com alfa = 1/4', linewidth=2,
-                    marker='*', color='#B892FF')
-    edos_erros.plot(conjunto_x, erros_ln[5], label='Dormand Price com passo fixo', linewidth=2,
+    from matplotlib.figure import Figure
+
+    #   erros_ln tem uma linha com o ln dos erros de cada método; erros nulos são nan e ficam fora do gráfico
+    erros_ln = resultados.analise.log
+    conjunto_x = resultados.x
+
+    plot_edos = Figure()
+    edos_erros = plot_edos.subplots()
+
+    edos_erros.plot(*reduz_pontos(conjunto_x, erros_ln[0]), label='Erro Euler', linewidth=2, marker='o',
+                    color='#FE4A49')
+    edos_erros.plot(*reduz_pontos(conjunto_x, erros_ln[1]), label='Erro Euler melhorado', linewidth=2, marker='v',
+                    color='#2AB7CA')
+    edos_erros.plot(*reduz_pontos(conjunto_x, erros_ln[2]), label='Erro Euler modificado', linewidth=2, marker='^',
+                    color='#FEC620')
+    edos_erros.plot(*reduz_pontos(conjunto_x, erros_ln[3]), label='Erro Genérico de segunda ordem com alfa = 1/3',
+                    linewidth=2, marker='s', color='#1A5274')
+    edos_erros.plot(*reduz_pontos(conjunto_x, erros_ln[4]), label='Erro Genérico de segunda ordem com alfa = 1/4',
+                    linewidth=2, marker='*', color='#B892FF')
+    edos_erros.plot(*reduz_pontos(conjunto_x, erros_ln[5]), label='Dormand Price com passo fixo', linewidth=2,
                     marker='>', color='#BAFF29')
+    edos_erros.plot(*reduz_pontos(conjunto_x, erros_ln[6]), label='Dormand Price com passo adaptativo', linewidth=2,
+                    marker='<', color='black')
+    for m, nome in enumerate(resultados.nomes[7:], 7):
+        rotulo, marcador, cor = _ROTULOS_METODOS[nome]
+        edos_erros.plot(*reduz_pontos(conjunto_x, erros_ln[m]), label=f'Erro {rotulo}', linewidth=2, marker=marcador,
+                        color=cor)
 
     edos_erros.legend(loc=(0, 0.2), fontsize='x-small', framealpha=1)
     edos_erros.set_title(f"Erros de cada método em relação ao y(x) = {titulo}")
     edos_erros.set_ylabel(f'ln(erros)')
 
-    plt.savefig(f'Erros em escala logaritmica dos Métodos numéricos para solução gráfica {contador}')
+    plot_edos.savefig(f'Erros em escala logaritmica dos Métodos numéricos para solução gráfica {contador}')
+
+
+@com_estilo
+def grafico_convergencia(estudo, contador):
+    """
+    Faz os gráficos de trabalho-precisão do estudo de convergência: erro máximo em função das avaliações da EDO e do
+    tempo de cálculo, em escala logarítmica
+    :param estudo: EstudoConvergencia, ver estudo_convergencia()
+    :param contador: contador para ser salvo no nome do gráfico
+    """
+    from matplotlib.figure import Figure
+
+    plot_edos = Figure(figsize=(12, 5))
+    por_avaliacoes, por_tempo = plot_edos.subplots(1, 2)
+
+    for nome, erros in estudo.erros.items():
+        rotulo, marcador, cor = _ROTULOS_METODOS[nome]
+        por_avaliacoes.loglog(estudo.avaliacoes[nome], erros, label=rotulo, linewidth=2, marker=marcador, color=cor)
+        por_tempo.loglog(estudo.tempos[nome], erros, label=rotulo, linewidth=2, marker=marcador, color=cor)
+
+    por_avaliacoes.set_xlabel('Avaliações da EDO')
+    por_avaliacoes.set_ylabel(f'Erro máximo ({estudo.referencia})')
+    por_tempo.set_xlabel('Tempo (s)')
+    por_tempo.legend(fontsize='x-small', framealpha=1)
+    plot_edos.suptitle('Trabalho-precisão dos métodos numéricos')
+    plot_edos.tight_layout()
+
+    plot_edos.savefig(f'Trabalho-precisão dos Métodos numéricos {contador}')
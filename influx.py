@@ -1,14 +1,15 @@
 import func
-from sympy import *
-from matplotlib import pyplot as plt
-import random
+import json
+import os
+from collections import OrderedDict, namedtuple
+from itertools import islice, product
+from math import inf
 
-x, y = symbols('x y')
-f = Function('f')
-init_printing(use_unicode=True)
+import numpy as np
 
 
-def v_linha(v_zero, t_zero, unidades_temporais, h):
+def v_linha(v_zero, t_zero, unidades_temporais, h, execucao='sequencial', exporta=None, graficos='arquivo',
+            instrumenta=False, gancho=None, semente=None):
     """
     Com base nos valores físicos e nas condições iniciais, gera a EDO a ser calculada, feito isso chama a função
     calcula(), para atravez dos métodos numéricos, calcular a solução da EDO
@@ -16,65 +17,221 @@ def v_linha(v_zero, t_zero, unidades_temporais, h):
     :param t_zero: tempo inicial
     :param unidades_temporais: intervalo de tempo a serem feitos os calculos
     :param h: passo entre o intervalo de tempo
+    :param execucao: 'sequencial' ou 'processos', ver func.executa_metodos()
+    :param exporta: arquivo (.csv, .npz ou .npy) onde gravar os volumes calculados, ver func.exporta_resultados()
+    :param graficos: 'arquivo', 'segundo_plano' ou 'nenhum', ver func.agenda_grafico()
+    :param instrumenta: se True, mede o tempo de cada fase e conta as avaliações da EDO e os passos de cada método,
+    e imprime o resumo, ver func.Instrumentacao
+    :param gancho: gancho de perfil chamado no início e no fim de cada fase, ver func.Instrumentacao
+    :param semente: semente do gerador dos ruídos (None para ruídos diferentes a cada execução)
+    :return: func.Resultados com os volumes de cada método, ver calcula()
     """
-    tempo = 0
-    Q1 = []
-    Q2 = []
+    instrumentacao = func.instrumentacao_opcional(instrumenta, gancho)
+    with func.fase(instrumentacao, 'forcante'):
+        V_linha, Q1, Q2, Vazamentos, Ruido = forcante(unidades_temporais, gerador=np.random.default_rng(semente))
 
-    for i in range(unidades_temporais + 1):
-        if 0 <= tempo < 20:
-            q1 = 110
-        elif 20 <= tempo < 40:
-            q1 = 100
-        elif 40 <= tempo < 80:
-            q1 = 95
-        else:
-            q1 = 100
-        Q1.append(q1)
+    resultados = calcula(v_zero, t_zero, h, unidades_temporais, V_linha, Q1, Q2, Vazamentos, Ruido, execucao, exporta,
+                         graficos, instrumentacao)
 
-        if 0 <= tempo < 30:
-            q2 = 100
-        elif 30 <= tempo < 40:
-            q2 = 95
-        elif 40 <= tempo < 70:
-            q2 = 105
-        else:
-            q2 = 85
-        Q2.append(q2)
+    if instrumentacao is not None:
+        print('\n'.join(func.texto_instrumentacao(instrumentacao, resultados.tempos)))
 
-        tempo += 1
+    return resultados
 
-    # vazamento
-    v_nominal = 0
-    vlim = 10
-    t_atraso = 50
-    tau = 0.05
 
-    V_linha = []
-    Vazamentos = []
-    Ruido = []
-    for i in range(unidades_temporais + 1):
+def vazoes(tempo, fator_q1=1, fator_q2=1):
+    """
+    Vazões programadas do reservatório, constantes por trechos
+    :param tempo: array com as unidades de tempo
+    :param fator_q1: fator aplicado à vazão afluente programada
+    :param fator_q2: fator aplicado à vazão efluente programada
+    :return: arrays float64 com a vazão afluente (Q1) e a efluente (Q2) em cada unidade de tempo
+    """
+    q1 = fator_q1 * np.select([tempo < 20, tempo < 40, tempo < 80], [110., 100., 95.], 100.)
+    q2 = fator_q2 * np.select([tempo < 30, tempo < 40, tempo < 70], [100., 95., 105.], 85.)
+    return q1, q2
+
+
+def vazamento(tempo, vlim=10, t_atraso=50, tau=0.05, v_nominal=0):
+    """
+    Vazamento do reservatório: v_nominal até t_atraso, e depois tende a vlim com constante de tempo 1 / tau
+    :param tempo: array com as unidades de tempo
+    :param vlim: vazamento limite
+    :param t_atraso: tempo em que o vazamento começa a crescer
+    :param tau: taxa de crescimento do vazamento
+    :param v_nominal: vazamento inicial
+    :return: array float64 com o vazamento em cada unidade de tempo
+    """
+    theta = np.minimum(t_atraso - tempo, 0)
+    return vlim - (vlim - v_nominal) * np.exp(tau * theta)
+
+
+def forcante(unidades_temporais, gerador=None, fator_q1=1, fator_q2=1, **parametros_vazamento):
+    """
+    Gera, de uma vez e como arrays numpy, os termos da EDO V' = Q1 - Q2 - vazamento + ruído em cada unidade de tempo
+    :param unidades_temporais: intervalo de tempo a serem feitos os calculos
+    :param gerador: np.random.Generator dos ruídos, uniformes em [-3, 3) (None para um gerador sem semente)
+    :param fator_q1: fator da vazão afluente, ver vazoes()
+    :param fator_q2: fator da vazão efluente, ver vazoes()
+    :param parametros_vazamento: vlim, t_atraso, tau e v_nominal, ver vazamento()
+    :return: arrays com V' (a forçante da EDO, ver func.EdoForcante), Q1, Q2, vazamentos e ruídos
+    """
+    if gerador is None:
+        gerador = np.random.default_rng()
+
+    tempo = np.arange(unidades_temporais + 1, dtype=np.float64)
+    q1, q2 = vazoes(tempo, fator_q1, fator_q2)
+    vazamentos = vazamento(tempo, **parametros_vazamento)
+    ruidos = gerador.uniform(-3, 3, tempo.size)
+
+    return q1 - q2 - vazamentos + ruidos, q1, q2, vazamentos, ruidos
+
+
+def le_serie(caminho, colunas, h, t_zero=None, unidades_temporais=None, formato=None, bloco=1 << 18):
+    """
+    Lê séries temporais medidas (ex.: as vazões afluente e efluente de um registro de sensores) e as interpola
+    linearmente na grade t_zero + i * h dos métodos numéricos. O arquivo é percorrido em blocos de linhas, e só o
+    bloco atual e as séries já na grade ficam na memória, então registros de vários GB não são carregados inteiros.
+    Formatos:
+    'csv': texto separado por vírgulas, com cabeçalho;
+    'npy': array numpy aberto com mmap_mode='r', estruturado (colunas pelos nomes dos campos) ou uma tabela
+    (pontos x colunas), com os nomes das colunas em caminho + '.json' (como o gravado por func.exporta_resultados())
+    :param caminho: arquivo com as séries
+    :param colunas: nomes (ou índices) das colunas: a do tempo, crescente, seguida das séries a interpolar
+    :param h: passo da grade
+    :param t_zero: início da grade (padrão: o primeiro tempo do arquivo)
+    :param unidades_temporais: número de passos da grade (padrão: até o último tempo do arquivo)
+    :param formato: 'csv' ou 'npy' (padrão: pela extensão de caminho)
+    :param bloco: número de linhas lidas por vez
+    :return: t_zero e a lista com um array por série de colunas[1:], com os valores em cada ponto da grade
+    """
+    if formato is None:
+        formato = {'.csv': 'csv', '.npy': 'npy'}.get(os.path.splitext(caminho)[1].lower())
+    if formato not in ('csv', 'npy'):
+        raise ValueError(f"formato deve ser 'csv' ou 'npy', recebido: {formato!r} para {caminho!r}")
+
+    blocos = _blocos_csv(caminho, colunas, bloco) if formato == 'csv' else _blocos_npy(caminho, colunas, bloco)
+    limite = inf if unidades_temporais is None else unidades_temporais + 1
+    partes = []
+    #   número de pontos da grade já interpolados, e a última linha lida, que liga um bloco ao seguinte
+    feitos = 0
+    anterior = None
+    for tabela in blocos:
+        if anterior is not None:
+            tabela = np.concatenate((anterior, tabela))
+        tempo = tabela[:, 0]
+        if np.any(np.diff(tempo) <= 0):
+            raise ValueError(f'Os tempos de {caminho!r} devem ser estritamente crescentes')
+
+        if t_zero is None:
+            t_zero = float(tempo[0])
+        if feitos == 0 and t_zero < tempo[0]:
+            raise ValueError(f'A grade começa em {t_zero}, antes do primeiro tempo de {caminho!r} ({tempo[0]})')
+
+        fim = min(int(np.floor((tempo[-1] - t_zero) / h + 1e-9)) + 1, limite)
+        if fim > feitos:
+            grade = t_zero + h * np.arange(feitos, fim)
+            partes.append(np.column_stack([np.interp(grade, tempo, serie) for serie in tabela[:, 1:].T]))
+            feitos = fim
+        if feitos == limite:
+            break
+        anterior = tabela[-1:]
+
+    if feitos == 0 or (limite != inf and feitos < limite):
+        raise ValueError(f'{caminho!r} termina antes do fim da grade ({feitos} de {limite} pontos)')
+
+    series = np.concatenate(partes)
+    return t_zero, [np.ascontiguousarray(serie) for serie in series.T]
+
 
-        if t_atraso - x.subs(x, i) >= 0:
-            theta = 0
-        else:
-            theta = t_atraso - x
+def _blocos_csv(caminho, colunas, bloco):
+    with open(caminho, newline='') as arquivo:
+        cabecalho = [nome.strip() for nome in arquivo.readline().split(',')]
+        indices = [_indice_coluna(coluna, cabecalho, caminho) for coluna in colunas]
+        while True:
+            linhas = list(islice(arquivo, bloco))
+            if not linhas:
+                return
+            yield np.loadtxt(linhas, delimiter=',', usecols=indices, ndmin=2, dtype=np.float64)
 
-        vazamento = vlim - (vlim - v_nominal) * exp(tau * theta)
-        Vazamentos.append(vazamento.subs(x, i))
 
-        # v_linha
-        ruido = round(random.uniform(-3, 3), 15)
-        Ruido.append(ruido)
+def _blocos_npy(caminho, colunas, bloco):
+    tabela = np.load(caminho, mmap_mode='r')
+    if tabela.dtype.names is not None:
+        series = [tabela[_indice_coluna(coluna, tabela.dtype.names, caminho, nomes_apenas=True)] for coluna in colunas]
+    else:
+        cabecalho = ()
+        if os.path.exists(caminho + '.json'):
+            with open(caminho + '.json', encoding='utf-8') as arquivo:
+                cabecalho = json.load(arquivo).get('colunas', ())
+        series = [tabela[:, _indice_coluna(coluna, cabecalho, caminho)] for coluna in colunas]
 
-        v_linha = Q1[i] - Q2[i] - vazamento + ruido
+    for inicio in range(0, len(series[0]), bloco):
+        #   só o bloco é lido do disco, na conversão para um array comum
+        yield np.column_stack([np.asarray(serie[inicio:inicio + bloco], dtype=np.float64) for serie in series])
 
-        V_linha.append(v_linha.subs(x, i))
 
-    calcula(v_zero, t_zero, h, unidades_temporais, V_linha, Q1, Q2, Vazamentos, Ruido)
+def _indice_coluna(coluna, cabecalho, caminho, nomes_apenas=False):
+    if isinstance(coluna, str):
+        if coluna not in cabecalho:
+            raise ValueError(f'A coluna {coluna!r} não está em {caminho!r}, colunas: {list(cabecalho)}')
+        return coluna if nomes_apenas else list(cabecalho).index(coluna)
+    if nomes_apenas:
+        return cabecalho[coluna]
+    return coluna
 
 
-def calcula(y_zero, x_zero, h, num_repet, v_linha, q1, q2, vazamentos, ruidos):
+def v_linha_serie(caminho, h, t_zero=None, unidades_temporais=None, colunas=('tempo', 'q1', 'q2'), volume=None,
+                  v_zero=None, execucao='sequencial', exporta=None, graficos='arquivo', instrumenta=False,
+                  gancho=None, formato=None, bloco=1 << 18, **parametros_vazamento):
+    """
+    Como v_linha(), mas com as vazões Q1 e Q2 medidas, lidas de arquivo por le_serie(), no lugar das programadas. A
+    EDO é V' = Q1 - Q2 - vazamento, sem ruído sintético, e o volume medido, se houver, é usado como solução de
+    referência nas tabelas de erro e na exportação
+    :param caminho: arquivo com as séries, ver le_serie()
+    :param h: passo entre o intervalo de tempo
+    :param t_zero: tempo inicial (padrão: o primeiro tempo do arquivo)
+    :param unidades_temporais: número de passos (padrão: até o último tempo do arquivo)
+    :param colunas: nomes (ou índices) das colunas do tempo, de Q1 e de Q2
+    :param volume: nome (ou índice) da coluna do volume medido, ou None
+    :param v_zero: volume inicial (padrão: o primeiro volume medido)
+    :param execucao: 'sequencial' ou 'processos', ver func.executa_metodos()
+    :param exporta: arquivo (.csv, .npz ou .npy) onde gravar os volumes calculados, ver func.exporta_resultados()
+    :param graficos: 'arquivo', 'segundo_plano' ou 'nenhum', ver func.agenda_grafico()
+    :param instrumenta: se True, mede o tempo de cada fase e imprime o resumo, ver func.Instrumentacao
+    :param gancho: gancho de perfil chamado no início e no fim de cada fase, ver func.Instrumentacao
+    :param formato: 'csv' ou 'npy', ver le_serie()
+    :param bloco: número de linhas lidas por vez, ver le_serie()
+    :param parametros_vazamento: vlim, t_atraso, tau e v_nominal, ver vazamento()
+    :return: func.Resultados com os volumes de cada método, ver calcula()
+    """
+    instrumentacao = func.instrumentacao_opcional(instrumenta, gancho)
+    with func.fase(instrumentacao, 'leitura'):
+        colunas = tuple(colunas) + (() if volume is None else (volume,))
+        t_zero, series = le_serie(caminho, colunas, h, t_zero, unidades_temporais, formato, bloco)
+        q1, q2 = series[:2]
+        medido = series[2] if volume is not None else None
+
+    if v_zero is None:
+        if medido is None:
+            raise ValueError('Sem a coluna do volume medido, v_zero deve ser informado')
+        v_zero = float(medido[0])
+
+    with func.fase(instrumentacao, 'forcante'):
+        vazamentos = vazamento(t_zero + h * np.arange(len(q1)), **parametros_vazamento)
+        V_linha = q1 - q2 - vazamentos
+
+    resultados = calcula(v_zero, t_zero, h, len(q1) - 1, V_linha, q1, q2, vazamentos, np.zeros_like(q1), execucao,
+                         exporta, graficos, instrumentacao, medido)
+
+    if instrumentacao is not None:
+        print('\n'.join(func.texto_instrumentacao(instrumentacao, resultados.tempos)))
+
+    return resultados
+
+
+def calcula(y_zero, x_zero, h, num_repet, v_linha, q1, q2, vazamentos, ruidos, execucao='sequencial', exporta=None,
+            graficos='arquivo', instrumentacao=None, exata=None):
     """
     Utiliza o PVI a ser calculado, utilizando os métodos numéricos para solução de EDOs, depois envia as soluções
     chamando a função graficos_influx() para criar os gráficos.
@@ -82,90 +239,307 @@ def calcula(y_zero, x_zero, h, num_repet, v_linha, q1, q2, vazamentos, ruidos):
     :param x_zero: tempo inicial
     :param h: passo entre o intervalo de tempo
     :param num_repet: intervalo de tempo a serem feitos os calculos
-    :param v_linha: EDOs
+    :param v_linha: forçante V' em cada unidade de tempo (array, ver forcante())
     :param q1: Valores de Q1
     :param q2: Valores de Q2
     :param vazamentos: Vazamentos
     :param ruidos: Ruidos
+    :param execucao: 'sequencial' ou 'processos', ver func.executa_metodos()
+    :param exporta: arquivo (.csv, .npz ou .npy) onde gravar os volumes calculados, ver func.exporta_resultados()
+    :param graficos: 'arquivo', 'segundo_plano' ou 'nenhum', ver func.agenda_grafico()
+    :param instrumentacao: func.Instrumentacao, ou None
+    :param exata: volume de referência na grade (ex.: o medido), ou None
+    :return: func.Resultados com os volumes de cada método, ver func.calcula_metodos()
+    """
+    with func.fase(instrumentacao, 'compilacao'):
+        edo = func.EdoForcante(v_linha)
+
+    resultados = func.calcula_metodos(y_zero, x_zero, h, num_repet, edo, execucao=execucao, exata=exata,
+                                      instrumentacao=instrumentacao)
+
+    if exporta is not None:
+        with func.fase(instrumentacao, 'exportacao'):
+            func.exporta_resultados(resultados, exporta)
+
+    with func.fase(instrumentacao, 'graficos'):
+        #   as séries de entrada vão como arrays float64, que são enviados a outro processo no modo 'segundo_plano'
+        series = [np.asarray(serie, dtype=np.float64) for serie in (q1, q2, vazamentos, ruidos, v_linha)]
+        func.agenda_grafico(graficos_influx, [resultados, y_zero] + series, graficos)
+
+    return resultados
+
+
+#   estatísticas de V - V_zero em cada unidade de tempo, uma linha por percentil (faixas) e por limiar (excedencia)
+EstatisticasConjunto = namedtuple('EstatisticasConjunto', ['t', 'media', 'desvio', 'percentis', 'faixas', 'limiares',
+                                                           'excedencia', 'realizacoes'])
+
+
+def conjunto(v_zero, t_zero, unidades_temporais, h, realizacoes=1000, semente=0, percentis=(5, 25, 50, 75, 95),
+             limiares=(0,), tabela='dormand_prince', execucao='sequencial', processos=None, lote=1000,
+             graficos='arquivo', **parametros):
+    """
+    Modo Monte Carlo do reservatório: calcula realizacoes cópias da EDO de v_linha(), cada uma com os seus ruídos,
+    e resume a distribuição de V - V_zero em cada unidade de tempo. As realizações são calculadas em lotes por
+    func.runge_kutta_lote(), com a aritmética feita em arrays sobre todas as realizações do lote, e os lotes podem
+    ser divididos entre processos. A realização j usa a semente j de np.random.SeedSequence(semente).spawn(), então
+    os resultados não dependem de lote nem de execucao. A memória é dominada pela tabela realizacoes x
+    (unidades_temporais + 1) de float64 (80 MB para 10^4 realizações de 1000 unidades de tempo)
+    :param v_zero: volume inicial
+    :param t_zero: tempo inicial
+    :param unidades_temporais: intervalo de tempo a serem feitos os calculos
+    :param h: passo entre o intervalo de tempo
+    :param realizacoes: número de realizações do ruído
+    :param semente: semente do conjunto
+    :param percentis: percentis de V - V_zero calculados em cada unidade de tempo
+    :param limiares: valores de V - V_zero cuja probabilidade de excedência é calculada em cada unidade de tempo
+    :param tabela: TabelaButcher, ou nome de uma tabela registrada em func.TABELAS
+    :param execucao: 'sequencial' ou 'processos', ver func.executa_metodos()
+    :param processos: número de processos (padrão: número de núcleos)
+    :param lote: número de realizações calculadas de uma vez
+    :param graficos: 'arquivo', 'segundo_plano' ou 'nenhum', ver func.agenda_grafico()
+    :param parametros: parâmetros das vazões e do vazamento, ver PARAMETROS_VARREDURA
+    :return: EstatisticasConjunto
     """
-    valores_t = []
-    for i in range(len(v_linha)):
-        valores_t.append(i)
+    #   a parte determinística da forçante é a mesma em todas as realizações, só os ruídos mudam
+    base = _sem_ruido(np.arange(unidades_temporais + 1, dtype=np.float64), **parametros)
+    sementes = np.random.SeedSequence(semente).spawn(realizacoes)
+
+    tarefas = [(_calcula_lote, (v_zero, t_zero, h, unidades_temporais, base, sementes[inicio:inicio + lote], tabela))
+               for inicio in range(0, realizacoes, lote)]
+    desvios = np.concatenate(func.executa_metodos(tarefas, execucao, processos))
+
+    estatisticas = EstatisticasConjunto(t_zero + h * np.arange(unidades_temporais + 1), desvios.mean(axis=0),
+                                        desvios.std(axis=0), tuple(percentis),
+                                        np.percentile(desvios, percentis, axis=0), tuple(limiares),
+                                        np.array([(desvios > limiar).mean(axis=0) for limiar in limiares]),
+                                        realizacoes)
+
+    func.agenda_grafico(graficos_conjunto, [estatisticas], graficos)
+
+    return estatisticas
+
+
+def _calcula_lote(v_zero, t_zero, h, unidades_temporais, base, sementes, tabela):
+    #   V - V_zero das realizações de sementes, uma linha por realização
+    ruidos = np.stack([np.random.default_rng(semente).uniform(-3, 3, len(base)) for semente in sementes])
+    edo = func.EdoForcante(base + ruidos)
+    valores = func.runge_kutta_lote(np.full(len(sementes), float(v_zero)), t_zero, h, unidades_temporais, edo, tabela)
+    return valores - v_zero
+
+
+def _sem_ruido(tempo, fator_q1=1, fator_q2=1, **parametros_vazamento):
+    #   parte determinística da forçante, Q1 - Q2 - vazamento
+    q1, q2 = vazoes(tempo, fator_q1, fator_q2)
+    return q1 - q2 - vazamento(tempo, **parametros_vazamento)
+
+
+#   parâmetros das vazões (ver vazoes()) e do vazamento (ver vazamento()) que podem ser variados, com os valores padrão
+PARAMETROS_VARREDURA = {'vlim': 10., 't_atraso': 50., 'tau': 0.05, 'v_nominal': 0., 'fator_q1': 1., 'fator_q2': 1.}
+
+#   colunas de resumo do armazenamento da varredura, calculadas a partir dos volumes
+RESUMOS_VARREDURA = ('volume_final', 'volume_minimo', 'volume_maximo')
+
+Varredura = namedtuple('Varredura', ['metadados', 'colunas', 'calculadas', 'reaproveitadas'])
+
+
+def varredura(caminho, v_zero, t_zero, unidades_temporais, h, grade, semente=0, tabela='dormand_prince',
+              execucao='processos', processos=None, lote=256, dtype=np.float32):
+    """
+    Calcula a EDO do reservatório para todas as combinações dos valores dos parâmetros das vazões e do vazamento e
+    guarda os volumes em um armazenamento em colunas: uma pasta com um arquivo .npy por coluna (um por parâmetro, o
+    volume em cada unidade de tempo, como uma tabela combinações x (unidades_temporais + 1), e os resumos de
+    RESUMOS_VARREDURA) e os metadados em metadados.json. As combinações que já estão no armazenamento são
+    reaproveitadas (os valores são comparados exatamente), então estender a grade só calcula as novas. Todas as
+    combinações usam os mesmos ruídos, e as de um lote são calculadas de uma vez por func.runge_kutta_lote(), com os
+    lotes divididos entre os processos
+    :param caminho: pasta do armazenamento, criada se não existir
+    :param v_zero: volume inicial
+    :param t_zero: tempo inicial
+    :param unidades_temporais: intervalo de tempo a serem feitos os calculos
+    :param h: passo entre o intervalo de tempo
+    :param grade: dict {parâmetro: valor, sequência ou range de valores}, ver PARAMETROS_VARREDURA; os parâmetros
+    ausentes ficam com o valor padrão
+    :param semente: semente dos ruídos, ou None para a EDO sem ruído
+    :param tabela: nome de uma tabela registrada em func.TABELAS
+    :param execucao: 'sequencial' ou 'processos', ver func.executa_metodos()
+    :param processos: número de processos (padrão: número de núcleos)
+    :param lote: número de combinações calculadas de uma vez
+    :param dtype: tipo dos volumes no armazenamento (float32 ocupa metade do espaço)
+    :return: Varredura com os metadados, as colunas de todo o armazenamento (abertas com mmap_mode='r'), e o
+    número de combinações calculadas e reaproveitadas
+    """
+    desconhecidos = set(grade) - set(PARAMETROS_VARREDURA)
+    if desconhecidos:
+        raise ValueError(f'Parâmetros desconhecidos: {sorted(desconhecidos)}, válidos: {list(PARAMETROS_VARREDURA)}')
+
+    metadados = {'v_zero': float(v_zero), 't_zero': float(t_zero), 'unidades_temporais': int(unidades_temporais),
+                 'h': float(h), 'semente': semente, 'tabela': tabela, 'parametros': list(PARAMETROS_VARREDURA),
+                 'colunas': list(PARAMETROS_VARREDURA) + ['volume'] + list(RESUMOS_VARREDURA),
+                 'dtype': np.dtype(dtype).name, 'combinacoes': 0}
+    existentes = {}
+    if os.path.exists(os.path.join(caminho, 'metadados.json')):
+        anteriores, existentes = le_varredura(caminho)
+        diferentes = [chave for chave in metadados if chave != 'combinacoes' and anteriores[chave] != metadados[chave]]
+        if diferentes:
+            raise ValueError(f'O armazenamento {caminho!r} foi calculado com outros {diferentes}, use outra pasta')
+
+    valores = [np.atleast_1d(np.asarray(grade.get(nome, padrao), dtype=np.float64)).tolist()
+               for nome, padrao in PARAMETROS_VARREDURA.items()]
+    feitas = set(zip(*(existentes[nome].tolist() for nome in PARAMETROS_VARREDURA))) if existentes else set()
+    combinacoes = list(OrderedDict.fromkeys(combinacao for combinacao in product(*valores)
+                                            if combinacao not in feitas))
+    pedidas = len(set(product(*valores)))
 
-    valores = [valores_t]
+    if combinacoes:
+        ruidos = (np.zeros(unidades_temporais + 1) if semente is None else
+                  np.random.default_rng(semente).uniform(-3, 3, unidades_temporais + 1))
+        tarefas = [(_calcula_combinacoes, (v_zero, t_zero, h, unidades_temporais, ruidos,
+                                           combinacoes[inicio:inicio + lote], tabela))
+                   for inicio in range(0, len(combinacoes), lote)]
+        volumes = np.concatenate(func.executa_metodos(tarefas, execucao, processos))
 
-    valores.append(func.euler(y_zero, x_zero, h, num_repet, v_linha))
-    valores.append(func.euler_mel(y_zero, x_zero, h, num_repet, v_linha))
-    valores.append(func.euler_mod(y_zero, x_zero, h, num_repet, v_linha))
-    valores.append(func.gen_seg_ord_alfa(y_zero, x_zero, h, num_repet, v_linha, 1 / 3))
-    valores.append(func.gen_seg_ord_alfa(y_zero, x_zero, h, num_repet, v_linha, 1 / 4))
-    valores.append(func.dormand_price_fixo(y_zero, x_zero, h, num_repet, v_linha))
+        novas = dict(zip(PARAMETROS_VARREDURA, np.array(combinacoes, dtype=np.float64).T))
+        novas.update(volume=volumes.astype(dtype), volume_final=volumes[:, -1], volume_minimo=volumes.min(axis=1),
+                     volume_maximo=volumes.max(axis=1))
+        _grava_varredura(caminho, metadados, existentes, novas)
 
-    graficos_influx(valores, y_zero, q1, q2, vazamentos, ruidos, v_linha)
+    metadados, colunas = le_varredura(caminho)
+    return Varredura(metadados, colunas, len(combinacoes), pedidas - len(combinacoes))
 
 
-def graficos_influx(valores, v_zero, q1, q2, vazamentos, ruidos, v_linha):
+def _calcula_combinacoes(v_zero, t_zero, h, unidades_temporais, ruidos, combinacoes, tabela):
+    #   volumes das combinações, uma linha por combinação
+    tempo = np.arange(unidades_temporais + 1, dtype=np.float64)
+    forcantes = np.stack([_sem_ruido(tempo, **dict(zip(PARAMETROS_VARREDURA, combinacao))) + ruidos
+                          for combinacao in combinacoes])
+    return func.runge_kutta_lote(np.full(len(combinacoes), float(v_zero)), t_zero, h, unidades_temporais,
+                                 func.EdoForcante(forcantes), tabela)
+
+
+def _grava_varredura(caminho, metadados, existentes, novas):
+    #   cada coluna é regravada com as linhas novas no fim e só então substitui a antiga, e os metadados, que dizem
+    #   quantas combinações há, são gravados por último, então uma interrupção não deixa o armazenamento incoerente
+    os.makedirs(caminho, exist_ok=True)
+    for nome in metadados['colunas']:
+        coluna = novas[nome] if nome not in existentes else np.concatenate((existentes[nome], novas[nome]))
+        arquivo = os.path.join(caminho, nome + '.npy')
+        with open(arquivo + '.tmp', 'wb') as temporario:
+            np.save(temporario, coluna)
+        metadados['combinacoes'] = len(coluna)
+        os.replace(arquivo + '.tmp', arquivo)
+
+    with open(os.path.join(caminho, 'metadados.json.tmp'), 'w', encoding='utf-8') as arquivo:
+        json.dump(metadados, arquivo)
+    os.replace(os.path.join(caminho, 'metadados.json.tmp'), os.path.join(caminho, 'metadados.json'))
+
+
+def le_varredura(caminho):
+    """
+    Abre o armazenamento gravado por varredura(), sem carregar as colunas na memória
+    :param caminho: pasta do armazenamento
+    :return: metadados e dict {coluna: array aberto com mmap_mode='r'}, com uma linha por combinação
+    """
+    with open(os.path.join(caminho, 'metadados.json'), encoding='utf-8') as arquivo:
+        metadados = json.load(arquivo)
+    #   colunas regravadas depois dos metadados (gravação interrompida) têm linhas a mais, que são ignoradas
+    colunas = {nome: np.load(os.path.join(caminho, nome + '.npy'), mmap_mode='r')[:metadados['combinacoes']]
+               for nome in metadados['colunas']}
+    return metadados, colunas
+
+
+@func.com_estilo
+def graficos_influx(resultados, v_zero, q1, q2, vazamentos, ruidos, v_linha):
     """
     Cria os gráficos com base nos resultados da EDOs
-    :param valores: conjunto de y solução das EDOs
+    :param resultados: func.Resultados com os volumes calculados por cada método
     :param v_zero: volume inicial
     :param q1: Q1
     :param q2: Q2
     :param vazamentos: Vazamentos
     :param ruidos: Ruidos
-    :param v_linha: EDOs
-    """
-    plt.style.use('seaborn')
-
-    comparacao, compa = plt.subplots()
-
-    euler_menos = []
-    euler_mel_menos = []
-    euler_mod_menos = []
-    gen_seg_ord_terco_menos = []
-    gen_seg_ord_quarto_menos = []
-    dormand_price_menos = []
-    for i in range(len(valores[0])):
-        euler_menos.append(valores[1][i] - v_zero)
-        euler_mel_menos.append(valores[2][i] - v_zero)
-        euler_mod_menos.append(valores[3][i] - v_zero)
-        gen_seg_ord_terco_menos.append(valores[4][i] - v_zero)
-        gen_seg_ord_quarto_menos.append(valores[5][i] - v_zero)
-        dormand_price_menos.append(valores[6][i] - v_zero)
-
-    valores_menos_v_zero = [euler_menos, euler_mel_menos, euler_mod_menos, gen_seg_ord_terco_menos,
-                            gen_seg_ord_quarto_menos, dormand_price_menos]
-
-    compa.plot(valores[0], valores_menos_v_zero[0], label='Euler', linewidth='3', color='#1A5274',
+    :param v_linha: forçante V'
+    """
+    from matplotlib.figure import Figure
+
+    comparacao = Figure()
+    compa = comparacao.subplots()
+
+    #   uma linha por método, na ordem de resultados.nomes
+    valores_menos_v_zero = resultados.valores - v_zero
+    valores_t = resultados.x
+
+    compa.plot(*func.reduz_pontos(valores_t, valores_menos_v_zero[0]), label='Euler', linewidth='3', color='#1A5274',
                alpha=0.9)
-    compa.plot(valores[0], valores_menos_v_zero[1], label='Euler melhorado', linewidth='3',
+    compa.plot(*func.reduz_pontos(valores_t, valores_menos_v_zero[1]), label='Euler melhorado', linewidth='3',
                color='#B892FF')
-    compa.plot(valores[0], valores_menos_v_zero[2], label='Euler modficado', linewidth='3',
+    compa.plot(*func.reduz_pontos(valores_t, valores_menos_v_zero[2]), label='Euler modficado', linewidth='3',
                color='#FEC620')
-    compa.plot(valores[0], valores_menos_v_zero[3], label='Genérico de segunda ordem com alfa = 1/3', linewidth='3',
-               color='#BAFF29')
-    compa.plot(valores[0], valores_menos_v_zero[4], label='Genérico de segunda ordem com alfa = 1/4', linewidth='3',
-               color='#2AB7CA', linestyle='--')
-    compa.plot(valores[0], valores_menos_v_zero[5], label='Dormand Price com passo fixo', linewidth='3',
-               color='#FE4A49', linestyle=':')
+    compa.plot(*func.reduz_pontos(valores_t, valores_menos_v_zero[3]), label='Genérico de segunda ordem com alfa = 1/3',
+               linewidth='3', color='#BAFF29')
+    compa.plot(*func.reduz_pontos(valores_t, valores_menos_v_zero[4]), label='Genérico de segunda ordem com alfa = 1/4',
+               linewidth='3', color='#2AB7CA', linestyle='--')
+    compa.plot(*func.reduz_pontos(valores_t, valores_menos_v_zero[5]), label='Dormand Price com passo fixo',
+               linewidth='3', color='#FE4A49', linestyle=':')
+    compa.plot(*func.reduz_pontos(resultados.x_adap, resultados.y_adap - v_zero),
+               label='Dormand Price com passo adaptativo', linewidth='3', color='black', linestyle='-.', alpha=0.6)
 
     compa.legend(fontsize='medium')
     compa.set_title(f"Métodos numéricos para subtração do fluxo pelo volume inicial(Q - Q_zero)")
 
-    plt.tight_layout()
-    plt.savefig(f'Comparação métodos numéricos para o fluxo')
+    comparacao.tight_layout()
+    comparacao.savefig(f'Comparação métodos numéricos para o fluxo')
 
-    graf, flux_vol = plt.subplots()
+    graf = Figure()
+    flux_vol = graf.subplots()
 
-    flux_vol.plot(valores[0], valores_menos_v_zero[0], label='V - V_zero (Euler)', color='#BAFF29')
-    flux_vol.plot(valores[0], q1, label='Afluente', color='#2AB7CA')
-    flux_vol.plot(valores[0], q2, label='Efluente', color='#FEC620')
-    flux_vol.plot(valores[0], v_linha, label='Q', color='#1A5274')
-    flux_vol.plot(valores[0], vazamentos, label='Vazamentos', color='#B892FF')
-    flux_vol.plot(valores[0], ruidos, label='Ruídos', color='#FE4A49')
+    flux_vol.plot(*func.reduz_pontos(valores_t, valores_menos_v_zero[0]), label='V - V_zero (Euler)', color='#BAFF29')
+    flux_vol.plot(*func.reduz_pontos(valores_t, q1), label='Afluente', color='#2AB7CA')
+    flux_vol.plot(*func.reduz_pontos(valores_t, q2), label='Efluente', color='#FEC620')
+    flux_vol.plot(*func.reduz_pontos(valores_t, v_linha), label='Q', color='#1A5274')
+    flux_vol.plot(*func.reduz_pontos(valores_t, vazamentos), label='Vazamentos', color='#B892FF')
+    flux_vol.plot(*func.reduz_pontos(valores_t, ruidos), label='Ruídos', color='#FE4A49')
 
     flux_vol.legend(fontsize='medium')
     flux_vol.set_title(f"Fluxos e volume do reservátorio")
 
-    plt.tight_layout()
-    plt.savefig(f'Fluxos e volume do reservátorio')
+    graf.tight_layout()
+    graf.savefig(f'Fluxos e volume do reservátorio')
+
+
+@func.com_estilo
+def graficos_conjunto(estatisticas):
+    """
+    Cria os gráficos do conjunto Monte Carlo: média e faixas de percentis de V - V_zero, e as probabilidades de
+    excedência de cada limiar ao longo do tempo
+    :param estatisticas: EstatisticasConjunto, ver conjunto()
+    """
+    from matplotlib.figure import Figure
+
+    graf = Figure(figsize=(8, 8))
+    volume, excedencia = graf.subplots(2, 1, sharex=True)
+
+    #   faixas entre percentis simétricos, das mais largas (mais claras) para as mais estreitas
+    pares = len(estatisticas.percentis) // 2
+    for j in range(pares):
+        volume.fill_between(estatisticas.t, estatisticas.faixas[j], estatisticas.faixas[-1 - j], color='#2AB7CA',
+                            alpha=0.2 + 0.3 * j / max(pares - 1, 1), linewidth=0,
+                            label=f'P{estatisticas.percentis[j]:g} - P{estatisticas.percentis[-1 - j]:g}')
+    if len(estatisticas.percentis) % 2:
+        volume.plot(estatisticas.t, estatisticas.faixas[pares], color='#1A5274', linewidth=2,
+                    label=f'P{estatisticas.percentis[pares]:g}')
+    volume.plot(estatisticas.t, estatisticas.media, color='#FE4A49', linewidth=2, linestyle='--', label='Média')
+
+    volume.legend(fontsize='medium')
+    volume.set_ylabel('V - V_zero')
+    volume.set_title(f'Conjunto de {estatisticas.realizacoes} realizações do ruído')
+
+    for limiar, probabilidades in zip(estatisticas.limiares, estatisticas.excedencia):
+        excedencia.plot(estatisticas.t, probabilidades, linewidth=2, label=f'V - V_zero > {limiar:g}')
+
+    excedencia.legend(fontsize='medium')
+    excedencia.set_xlabel('t')
+    excedencia.set_ylabel('Probabilidade de excedência')
+    excedencia.set_ylim(-0.02, 1.02)
+
+    graf.tight_layout()
+    graf.savefig('Conjunto Monte Carlo do volume do reservátorio')
@@ -6,49 +6,39 @@ pip install *nome da biblioteca*
 """
 import func
 import influx
-from sympy import *
+from sympy import Function, symbols
 
 x, y = symbols('x y')
 f = Function('f')
-init_printing(use_unicode=True)
 
 
-#   Primeira parte do trabalho usa a biblioteca "func"
+if __name__ == '__main__':
+    #   Primeira parte do trabalho usa a biblioteca "func"
+    #   os PVIs são independentes e rodam em paralelo; o bloco __main__ evita que os processos do pool, ao importarem
+    #   este arquivo, executem o trabalho de novo
 
-# Primeiro PVI
-y_zero = 1
-x_zero = 0
-h = 0.1
-num_repet = 10
-y_linha = -f(x)
+    pvis = [
+        # Primeiro PVI
+        {'y_zero': 1, 'x_zero': 0, 'h': 0.1, 'num_repet': 10, 'y_linha': -f(x), 'contador': 1},
+        # Segundo PVI
+        {'y_zero': 4, 'x_zero': 2, 'h': 0.1, 'num_repet': 10, 'y_linha': (x + f(x) + 1) / (2 * x), 'contador': 2},
+        # Terceiro PVI
+        {'y_zero': 1, 'x_zero': 0, 'h': 0.1, 'num_repet': 10, 'y_linha': f(x) * (pow(x, 2) - 1), 'contador': 3},
+    ]
 
-func.calcula_main(y_zero, x_zero, h, num_repet, y_linha, 1)
+    func.calcula_varios(pvis)
 
-# Segundo PVI
-y_zero = 4
-x_zero = 2
-h = 0.1
-num_repet = 10
-y_linha = (x + f(x) + 1) / (2 * x)
+    #   estudo de convergência de uma EDO sem solução analítica (Riccati): o dsolve não a resolve e as ordens são
+    #   medidas contra a extrapolação de Richardson
+    func.print_convergencia(func.estudo_convergencia(0, 0, 0.1, 10, pow(f(x), 2) + x, refinamentos=4,
+                                                     graficos='arquivo', contador=4))
 
-func.calcula_main(y_zero, x_zero, h, num_repet, y_linha, 2)
+    #   Segunda parte do trabalho usa a biblioteca "influx"
 
-# Terceiro PVI
-y_zero = 1
-x_zero = 0
-h = 0.1
-num_repet = 10
-y_linha = f(x) * (pow(x, 2) - 1)
+    # Problema prático
+    v_zero = 500
+    t_zero = 0
+    unidades_temporais = 100
+    h = 1
 
-func.calcula_main(y_zero, x_zero, h, num_repet, y_linha, 3)
-
-
-#   Segunda parte do trabalho usa a biblioteca "influx"
-
-# Problema prático
-v_zero = 500
-t_zero = 0
-unidades_temporais = 100
-h = 1
-
-influx.v_linha(v_zero, t_zero, unidades_temporais, h)
+    influx.v_linha(v_zero, t_zero, unidades_temporais, h)